@@ -0,0 +1,427 @@
+"""Persistent cache of dictionary pages and mnemonics, with a lemma index.
+
+Pages are stored by their Cambridge ``dict_url`` (``"english-turkish/run"``)
+and mnemonics by ``mnemonic_cache_key``. The lemma index maps inflected
+forms (``ran``, ``runs``) to the headword whose page covers them, so an
+inflected input fetched once resolves to the same page and cache entries
+afterwards. It only holds headwords and inputs that Cambridge answered with
+another headword's page. Forms are never guessed, and the inflections a page
+lists are not trusted either: "left" is listed under "leave" but is also a
+headword of its own, and redirecting it would hide that page for good.
+
+``TieredCache`` puts the local cache in front of read-only word packs and,
+optionally, a ``RemoteCache`` shared with other clients through
+``cache_server.py``.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from .records import WordData
+from .resilience import CircuitBreaker
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    dict_url TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mnemonics (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lemmas (
+    dictionary TEXT NOT NULL,
+    form TEXT NOT NULL,
+    headword TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    PRIMARY KEY (dictionary, form)
+) WITHOUT ROWID;
+"""
+
+# Lower wins when two headwords claim the same form
+HEADWORD = 0  # the form is a headword itself
+REDIRECT = 1  # Cambridge answered the form with the headword's page
+
+# Bump to rebuild the lemma index of existing caches when indexing changes
+LEMMA_INDEX_VERSION = 2
+
+
+def slugify(word: str) -> str:
+    """Cambridge URL form of a word"""
+    return word.strip().lower().replace(" ", "-")
+
+
+def split_dict_url(dict_url: str) -> Tuple[str, str]:
+    dictionary, _, slug = dict_url.partition("/")
+    return dictionary, slug
+
+
+class WordCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            index_version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            needs_index = (
+                self._conn.execute("SELECT 1 FROM lemmas LIMIT 1").fetchone() is None
+                or index_version < LEMMA_INDEX_VERSION
+            ) and self._conn.execute("SELECT 1 FROM pages LIMIT 1").fetchone() is not None
+            self._conn.execute(f"PRAGMA user_version = {LEMMA_INDEX_VERSION}")
+        if needs_index:
+            self.rebuild_lemma_index()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_page(self, dict_url: str) -> Optional[WordData]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM pages WHERE dict_url = ?", (dict_url,)
+            ).fetchone()
+        return WordData.from_bytes(row[0]) if row else None
+
+    def put_page(self, dict_url: str, word_data: WordData):
+        """Store a fetched page and index the forms it covers.
+
+        The page is also stored under its headword's URL, so a page reached
+        through an inflected form is found by the canonical lookup too.
+        """
+        dictionary, slug = split_dict_url(dict_url)
+        urls = {dict_url}
+        if word_data.headword:
+            urls.add(f"{dictionary}/{slugify(word_data.headword)}")
+
+        blob = word_data.to_bytes()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (dict_url, data, fetched_at) VALUES (?, ?, ?)",
+                [(url, blob, now) for url in urls],
+            )
+            self._index_page(dictionary, slug, word_data)
+
+    def _index_page(self, dictionary: str, slug: str, word_data: WordData):
+        if not word_data.headword:
+            return
+        headword = slugify(word_data.headword)
+        entries = [(headword, HEADWORD)]
+        if slug != headword:
+            # Cambridge served the headword's page for this input
+            entries.append((slug, REDIRECT))
+
+        # Keep the existing mapping unless the new one has a stronger claim
+        self._conn.executemany(
+            "INSERT INTO lemmas (dictionary, form, headword, priority) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (dictionary, form) DO UPDATE"
+            " SET headword = excluded.headword, priority = excluded.priority"
+            " WHERE excluded.priority < lemmas.priority",
+            [(dictionary, form, headword, priority) for form, priority in entries if form],
+        )
+
+    def rebuild_lemma_index(self) -> int:
+        """Rebuild the lemma index from every cached page; returns the number of forms"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM lemmas")
+            for dict_url, blob in self._conn.execute("SELECT dict_url, data FROM pages").fetchall():
+                dictionary, slug = split_dict_url(dict_url)
+                self._index_page(dictionary, slug, WordData.from_bytes(blob))
+            return self._conn.execute("SELECT COUNT(*) FROM lemmas").fetchone()[0]
+
+    def lookup_lemma(self, dictionary: str, form: str) -> Optional[str]:
+        """Headword slug of the page covering ``form``, if known"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT headword FROM lemmas WHERE dictionary = ? AND form = ?",
+                (dictionary, slugify(form)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def resolve_dict_url(self, dict_url: str) -> str:
+        """Map a dict_url for an inflected form to its headword's dict_url"""
+        dictionary, slug = split_dict_url(dict_url)
+        headword = self.lookup_lemma(dictionary, slug)
+        return f"{dictionary}/{headword}" if headword else dict_url
+
+    def iter_pages(self, dictionary: str, chunk_size: int = 500) -> Iterator[Tuple[str, WordData]]:
+        """Every cached page of one dictionary, read in chunks"""
+        last = f"{dictionary}/"
+        # "0" sorts right after "/", so this is a range scan on the primary key
+        end = f"{dictionary}0"
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT dict_url, data FROM pages WHERE dict_url > ? AND dict_url < ?"
+                    " ORDER BY dict_url LIMIT ?",
+                    (last, end, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            for dict_url, blob in rows:
+                yield dict_url, WordData.from_bytes(blob)
+            last = rows[-1][0]
+
+    def iter_lemmas(self, dictionary: str) -> Iterator[Tuple[str, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT form, headword FROM lemmas WHERE dictionary = ?", (dictionary,)
+            ).fetchall()
+        return iter(rows)
+
+    # A local cache hands out no leases, so there is nothing to release
+    def release_page(self, dict_url: str):
+        pass
+
+    def release_mnemonic(self, key: str):
+        pass
+
+    def get_mnemonic(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM mnemonics WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_mnemonic(self, key: str, mnemonic_data: Dict):
+        data = {k: v for k, v in mnemonic_data.items() if k != "usage"}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mnemonics (key, data, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(data, ensure_ascii=False), time.time()),
+            )
+
+
+class RemoteCache:
+    """Client for a shared ``cache_server.py``, used as a writable tier.
+
+    A miss takes the server's lease on the key, so the caller is expected
+    to fill it with ``put_*`` or give it up with ``release_*``. A miss on a
+    key another client holds the lease on waits up to ``wait`` seconds for
+    that client's result. When the server is unreachable, lookups skip it
+    for a while instead of timing out on every word.
+    """
+
+    writable = True
+
+    def __init__(self, url: str, token: str = "", timeout: float = 5.0, wait: float = 20.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.wait = wait
+        self._breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+        # (namespace, key) leases the server granted this client
+        self._leases = set()
+        self._leases_lock = threading.Lock()
+        self._session = requests.Session()
+        if token:
+            self._session.headers["X-MnemoMaker-Token"] = token
+
+    def close(self):
+        self._session.close()
+
+    def _post(self, path: str, payload: Dict, wait: float = 0.0) -> Optional[Dict]:
+        if not self._breaker.allow():
+            return None
+        try:
+            response = self._session.post(
+                f"{self.url}{path}", json=payload, timeout=self.timeout + wait
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self._breaker.record_failure()
+            print(f"MnemoMaker: cache server {self.url} unavailable: {e}")
+            return None
+        self._breaker.record_success()
+        return result
+
+    def _get(self, namespace: str, keys: List[str], lease: bool, wait: float) -> Dict[str, str]:
+        result = self._post(
+            "/get", {"namespace": namespace, "keys": keys, "lease": lease, "wait": wait}, wait
+        )
+        if not result:
+            return {}
+        with self._leases_lock:
+            self._leases.update((namespace, key) for key in result.get("leased", []))
+        return result.get("values") or {}
+
+    @staticmethod
+    def _decode(namespace: str, key: str, value: str):
+        """Parse a served value; malformed or too new records count as misses"""
+        try:
+            if namespace == "pages":
+                return WordData.loads(value)
+            mnemonic_data = json.loads(value)
+            if not isinstance(mnemonic_data, dict) or not all(
+                isinstance(mnemonic_data.get(field), str)
+                for field in ("mnemonic", "synonym", "antonym")
+            ):
+                raise ValueError("not a mnemonic")
+            return mnemonic_data
+        except (ValueError, TypeError, IndexError, KeyError) as e:
+            print(f"MnemoMaker: ignoring unreadable cache server entry {key}: {e}")
+            return None
+
+    def _get_decoded(self, namespace: str, keys: List[str], lease: bool, wait: float) -> Dict:
+        decoded = {}
+        for key, value in self._get(namespace, keys, lease, wait).items():
+            item = self._decode(namespace, key, value)
+            if item is not None:
+                decoded[key] = item
+        return decoded
+
+    def get_page(self, dict_url: str) -> Optional[WordData]:
+        return self._get_decoded("pages", [dict_url], True, self.wait).get(dict_url)
+
+    def get_pages(self, dict_urls: List[str]) -> Dict[str, WordData]:
+        """Batch lookup without leases or waiting"""
+        return self._get_decoded("pages", dict_urls, False, 0.0)
+
+    def get_mnemonic(self, key: str) -> Optional[Dict]:
+        return self._get_decoded("mnemonics", [key], True, self.wait).get(key)
+
+    def get_mnemonics(self, keys: List[str]) -> Dict[str, Dict]:
+        """Batch lookup without leases or waiting"""
+        return self._get_decoded("mnemonics", keys, False, 0.0)
+
+    def lookup_lemma(self, dictionary: str, form: str) -> Optional[str]:
+        # Lemmas are indexed locally from the pages the server hands out
+        return None
+
+    def _put(self, namespace: str, items: Dict[str, str]):
+        with self._leases_lock:
+            self._leases.difference_update((namespace, key) for key in items)
+        self._post("/put", {"namespace": namespace, "items": items})
+
+    def _release(self, namespace: str, key: str):
+        # Only give up leases this client holds; a client whose wait timed
+        # out must not cancel the lease of the client still computing
+        with self._leases_lock:
+            if (namespace, key) not in self._leases:
+                return
+            self._leases.discard((namespace, key))
+        self._post("/release", {"namespace": namespace, "keys": [key]})
+
+    def put_page(self, dict_url: str, word_data: WordData):
+        dictionary, _ = split_dict_url(dict_url)
+        value = word_data.dumps()
+        items = {dict_url: value}
+        if word_data.headword:
+            items[f"{dictionary}/{slugify(word_data.headword)}"] = value
+        self._put("pages", items)
+
+    def put_mnemonic(self, key: str, mnemonic_data: Dict):
+        data = {k: v for k, v in mnemonic_data.items() if k != "usage"}
+        self._put("mnemonics", {key: json.dumps(data, ensure_ascii=False)})
+
+    def release_page(self, dict_url: str):
+        self._release("pages", dict_url)
+
+    def release_mnemonic(self, key: str):
+        self._release("mnemonics", key)
+
+
+class TieredCache:
+    """A writable ``WordCache`` in front of other tiers.
+
+    Reads try the primary cache first, then each tier in order. Read-only
+    tiers (word packs) are never written to; writable tiers (a shared
+    ``RemoteCache``) receive every write, and their hits are copied into
+    the primary cache.
+    """
+
+    def __init__(self, primary: WordCache, tiers: Iterable = ()):
+        self.primary = primary
+        self.tiers = list(tiers)
+
+    def add_tier(self, tier):
+        self.tiers.append(tier)
+
+    def close(self):
+        self.primary.close()
+        for tier in self.tiers:
+            tier.close()
+
+    def _writable_tiers(self) -> list:
+        return [tier for tier in self.tiers if getattr(tier, "writable", False)]
+
+    def _first(self, method: str, *args) -> Tuple[Any, Any]:
+        """First hit across the tiers, with the tier it came from"""
+        for source in [self.primary] + self.tiers:
+            value = getattr(source, method)(*args)
+            if value is not None:
+                return value, source
+        return None, None
+
+    def get_page(self, dict_url: str) -> Optional[WordData]:
+        word_data, source = self._first("get_page", dict_url)
+        if getattr(source, "writable", False):
+            self.primary.put_page(dict_url, word_data)
+        return word_data
+
+    def get_mnemonic(self, key: str) -> Optional[Dict]:
+        mnemonic_data, source = self._first("get_mnemonic", key)
+        if getattr(source, "writable", False):
+            self.primary.put_mnemonic(key, mnemonic_data)
+        return mnemonic_data
+
+    def prefetch_pages(self, dict_urls: List[str]) -> int:
+        """Copy pages missing locally from the writable tiers in one batch
+        request per tier; returns the number of pages copied"""
+        missing = [url for url in dict_urls if self.primary.get_page(url) is None]
+        copied = 0
+        for tier in self._writable_tiers():
+            if not missing:
+                break
+            for dict_url, word_data in tier.get_pages(missing).items():
+                self.primary.put_page(dict_url, word_data)
+                copied += 1
+            missing = [url for url in missing if self.primary.get_page(url) is None]
+        return copied
+
+    def prefetch_mnemonics(self, keys: List[str]) -> int:
+        missing = [key for key in keys if self.primary.get_mnemonic(key) is None]
+        copied = 0
+        for tier in self._writable_tiers():
+            if not missing:
+                break
+            found = tier.get_mnemonics(missing)
+            for key, mnemonic_data in found.items():
+                self.primary.put_mnemonic(key, mnemonic_data)
+                copied += 1
+            missing = [key for key in missing if key not in found]
+        return copied
+
+    def lookup_lemma(self, dictionary: str, form: str) -> Optional[str]:
+        return self._first("lookup_lemma", dictionary, form)[0]
+
+    def resolve_dict_url(self, dict_url: str) -> str:
+        dictionary, slug = split_dict_url(dict_url)
+        headword = self.lookup_lemma(dictionary, slug)
+        return f"{dictionary}/{headword}" if headword else dict_url
+
+    def put_page(self, dict_url: str, word_data: WordData):
+        self.primary.put_page(dict_url, word_data)
+        for tier in self._writable_tiers():
+            tier.put_page(dict_url, word_data)
+
+    def put_mnemonic(self, key: str, mnemonic_data: Dict):
+        self.primary.put_mnemonic(key, mnemonic_data)
+        for tier in self._writable_tiers():
+            tier.put_mnemonic(key, mnemonic_data)
+
+    def release_page(self, dict_url: str):
+        for tier in self._writable_tiers():
+            tier.release_page(dict_url)
+
+    def release_mnemonic(self, key: str):
+        for tier in self._writable_tiers():
+            tier.release_mnemonic(key)
@@ -0,0 +1,284 @@
+"""Shared cache server for many MnemoMaker clients on one network.
+
+Dictionary pages and mnemonics fetched by one Anki client are served to
+every other client, so a class working through the same word list scrapes
+Cambridge and calls the LLM once per word instead of once per machine.
+It only needs the Python standard library and can run on any machine the
+clients can reach::
+
+    python cache_server.py --db mnemomaker_shared.sqlite --host 0.0.0.0 \
+        --port 8765 --token <secret>
+
+then set ``cache_server_url`` to ``http://<host>:8765`` and
+``cache_server_token`` in each client's add-on config. Anyone who can write
+to the server controls what ends up on everyone's cards, so it only listens
+on other interfaces than loopback when a token is set.
+
+Protocol (JSON over HTTP POST, values are opaque strings)::
+
+    /get      {"namespace", "keys", "lease": bool, "wait": seconds}
+              -> {"values": {key: value}, "leased": [key, ...]}
+    /put      {"namespace", "items": {key: value}}
+    /release  {"namespace", "keys"}
+    GET /stats
+
+A client that misses a key with ``lease`` set is granted the lease and is
+expected to compute the value and ``/put`` it (or ``/release`` it on
+failure). Other clients asking for a leased key wait up to ``wait`` seconds
+and receive the value as soon as it is put, so concurrent misses for the
+same word are computed once and fanned out to everyone.
+"""
+import argparse
+import hmac
+import ipaddress
+import json
+import math
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Tuple
+
+NAMESPACES = ("pages", "mnemonics")
+MAX_KEYS = 500
+MAX_WAIT = 30.0
+MAX_BODY = 16 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+
+class SharedStore:
+    """Key/value entries per namespace, plus in-memory leases on missing keys"""
+
+    def __init__(self, path: str, lease_seconds: float = 60.0):
+        self.lease_seconds = lease_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._leases: Dict[Tuple[str, str], float] = {}
+        self._changed = threading.Condition()
+
+    def _read(self, namespace: str, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({placeholders})",
+            [namespace] + keys,
+        ).fetchall()
+        return dict(rows)
+
+    def _lease_expiry(self, namespace: str, key: str, now: float) -> float:
+        """Expiry of a live lease on the key, or 0 if it isn't leased"""
+        expiry = self._leases.get((namespace, key), 0.0)
+        if expiry and expiry <= now:
+            del self._leases[(namespace, key)]
+            return 0.0
+        return expiry
+
+    def get(self, namespace: str, keys: List[str], lease: bool, wait: float) -> Dict:
+        deadline = time.monotonic() + min(max(wait, 0.0), MAX_WAIT)
+        with self._changed:
+            values = self._read(namespace, keys)
+            now = time.monotonic()
+            leased, waiting = [], []
+            for key in keys:
+                if key in values:
+                    continue
+                if self._lease_expiry(namespace, key, now):
+                    waiting.append(key)
+                elif lease:
+                    self._leases[(namespace, key)] = now + self.lease_seconds
+                    leased.append(key)
+
+            # Wait for other clients to put the keys they hold leases on.
+            # A key whose lease is released or expires is returned as a miss.
+            while waiting:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                expiries = [self._lease_expiry(namespace, key, now) for key in waiting]
+                waiting = [key for key, expiry in zip(waiting, expiries) if expiry]
+                if not waiting:
+                    break
+                self._changed.wait(min(deadline, min(e for e in expiries if e)) - now)
+                found = self._read(namespace, waiting)
+                values.update(found)
+                waiting = [key for key in waiting if key not in found]
+        return {"values": values, "leased": leased}
+
+    def put(self, namespace: str, items: Dict[str, str]):
+        now = time.time()
+        with self._changed:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, updated_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    [(namespace, key, value, now) for key, value in items.items()],
+                )
+            for key in items:
+                self._leases.pop((namespace, key), None)
+            self._changed.notify_all()
+
+    def release(self, namespace: str, keys: List[str]):
+        with self._changed:
+            for key in keys:
+                self._leases.pop((namespace, key), None)
+            self._changed.notify_all()
+
+    def stats(self) -> Dict:
+        with self._changed:
+            counts = dict(
+                self._conn.execute(
+                    "SELECT namespace, COUNT(*) FROM entries GROUP BY namespace"
+                ).fetchall()
+            )
+            return {"entries": counts, "leases": len(self._leases)}
+
+
+def _strings(value, name: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} must be a list of strings")
+    return value
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MnemoMakerCache/1"
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        sent = self.headers.get("X-MnemoMaker-Token", "")
+        if token and not hmac.compare_digest(sent.encode("utf-8"), token.encode("utf-8")):
+            self._reply(403, {"error": "invalid token"})
+            return False
+        return True
+
+    def _reply(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/stats":
+            self._reply(200, self.server.store.stats())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY:
+                raise ValueError("request too large")
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            namespace = request.get("namespace")
+            if namespace not in NAMESPACES:
+                raise ValueError(f"unknown namespace {namespace!r}")
+            keys = _strings(request.get("keys", []), "keys")
+            items = request.get("items") or {}
+            if not isinstance(items, dict) or not all(
+                isinstance(value, str) for value in items.values()
+            ):
+                raise ValueError("items must map keys to strings")
+            wait = request.get("wait", 0)
+            if isinstance(wait, bool) or not isinstance(wait, (int, float)) or not math.isfinite(wait):
+                raise ValueError("wait must be a number")
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+
+        store = self.server.store
+        if self.path == "/get":
+            result = store.get(namespace, keys[:MAX_KEYS], bool(request.get("lease")), wait)
+            self._reply(200, result)
+        elif self.path == "/put":
+            store.put(namespace, items)
+            self._reply(200, {"stored": len(items)})
+        elif self.path == "/release":
+            store.release(namespace, keys)
+            self._reply(200, {})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def make_server(
+    db_path: str,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    token: str = "",
+    lease_seconds: float = 60.0,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    if not token and not is_loopback(host):
+        raise ValueError(f"refusing to listen on {host} without a token")
+    server = ThreadingHTTPServer((host, port), CacheRequestHandler)
+    server.daemon_threads = True
+    server.store = SharedStore(db_path, lease_seconds)
+    server.token = token
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache server for MnemoMaker clients")
+    parser.add_argument("--db", default="mnemomaker_shared.sqlite", help="SQLite database path")
+    parser.add_argument(
+        "--host", default="127.0.0.1",
+        help="interface to listen on; use 0.0.0.0 (with --token) to serve the network",
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default="", help="shared secret clients must send")
+    parser.add_argument(
+        "--lease-seconds", type=float, default=60.0,
+        help="how long a client may take to fill a key it missed",
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    try:
+        server = make_server(
+            args.db, args.host, args.port, args.token, args.lease_seconds, args.verbose
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"MnemoMaker cache server listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
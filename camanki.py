@@ -6,6 +6,8 @@ import random
 # Prefer vendor/libs/<os>/, fallback to vendor/libs/
 base_dir = os.path.dirname(__file__)
 libs_base = os.path.join(base_dir, "libs")
+# Anki keeps user_files/ across add-on updates
+user_files_dir = os.path.join(base_dir, "user_files")
 
 plat = sys.platform
 if plat.startswith("win"):
@@ -24,6 +26,12 @@ for p in candidate_paths:
     if os.path.isdir(p) and p not in sys.path:
         sys.path.insert(0, p)
 
+
+def user_files_path(name: str) -> str:
+    """Path of a file inside the add-on's persistent user_files folder"""
+    os.makedirs(user_files_dir, exist_ok=True)
+    return os.path.join(user_files_dir, name)
+
 # Modern platform-aware pydantic loading with graceful fallbacks
 def _setup_pydantic_environment():
     """Setup pydantic with multiple fallback strategies for cross-platform compatibility"""
@@ -205,66 +213,164 @@ except Exception as e:
 
 import requests
 from bs4 import BeautifulSoup
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
+import hashlib
+import html
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from .records import Entry, WordData
+from .resilience import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    RetryPolicy,
+    breaker_for,
+    is_retryable,
+)
+from .singleflight import SingleFlight
+
+# Concurrent requests for the same page or mnemonic share one in-flight call
+_word_data_flights = SingleFlight()
+_mnemonic_flights = SingleFlight()
+
+
+def mnemonic_cache_key(
+    word: str, definition: str, native_language: str, target_language: str
+) -> str:
+    """Identify a mnemonic request independently of provider and model"""
+    payload = json.dumps(
+        [word.strip().lower(), (definition or "").strip(), native_language, target_language],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+SYSTEM_PROMPT = """You are an expert in creating memorable mnemonics and providing vocabulary insights.
+You understand that mnemonics are most effective when provided in the user's native language,
+while synonyms and antonyms should be in the target learning language."""
+
+# Prompt variants; placeholders are filled by both the LangChain and HTTP paths
+PROMPT_PROFILES = {
+    "detailed": {
+        "system": SYSTEM_PROMPT,
+        "human": """Create a memorable mnemonic for the word '{word}'.
+Definition: {definition}
+
+Requirements:
+1. Create the mnemonic in {native_language} (user's native language)
+2. Make it easy to remember for {native_language} speakers
+3. Use culturally relevant word associations or stories that make sense to {native_language} speakers
+4. Keep it concise (max 2 sentences)
+5. Use simple language appropriate for a 5-year-old
+6. Connect clearly to the word's meaning
+7. Provide one synonym and one antonym in {target_language}
+
+Output format:
+- Mnemonic: (in {native_language})
+- Synonym: (in {target_language})
+- Antonym: (in {target_language}""",
+    },
+    "compact": {
+        "system": "You write short, vivid vocabulary mnemonics.",
+        "human": """Word: '{word}' ({definition})
+Mnemonic: max 2 simple sentences in {native_language}, using sound-alike or cultural associations tied to the meaning.
+Answer exactly:
+- Mnemonic: (in {native_language})
+- Synonym: (in {target_language})
+- Antonym: (in {target_language})""",
+    },
+}
+
+PROVIDER_BASE_URLS = {
+    "groq": "https://api.groq.com/openai/v1",
+    "openai": "https://api.openai.com/v1",
+    # llama.cpp server default; Ollama serves the same API on :11434/v1
+    "local": "http://localhost:8080/v1",
+}
+
+# The answer is three short lines; reasoning models spend extra tokens thinking first
+DEFAULT_MAX_TOKENS = 200
+MODEL_MAX_TOKENS = {
+    "deepseek-r1-distill-llama-70b": 1500,
+    "o1-mini": 2000,
+}
 
 
 class MnemonicGenerator:
-    def __init__(self, provider: str, api_key: str, model: str):
+    def __init__(
+        self,
+        provider: str,
+        api_key: str,
+        model: str,
+        retry_policy: Optional[RetryPolicy] = None,
+        fallback: Optional["MnemonicGenerator"] = None,
+        prompt_profile: str = "compact",
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 4,
+        batch_size: int = 10,
+        cache=None,
+    ):
+        if provider not in PROVIDER_BASE_URLS:
+            raise ValueError(f"Unsupported provider: {provider}")
+
         self.provider = provider
         self.api_key = api_key
         self.model = model
+        self.base_url = (base_url or PROVIDER_BASE_URLS[provider]).rstrip("/")
+        # Batch jobs generate up to max_concurrency cards at once, batch_size per round
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker_for(provider, model)
+        # Generator for another provider to use while this one is unhealthy
+        self.fallback = fallback
+        # WordCache holding previously generated mnemonics
+        self.cache = cache
+
+        if prompt_profile not in PROMPT_PROFILES:
+            raise ValueError(f"Unknown prompt profile: {prompt_profile}")
+        self.profile = PROMPT_PROFILES[prompt_profile]
+        self.max_tokens = max_tokens or MODEL_MAX_TOKENS.get(model, DEFAULT_MAX_TOKENS)
+        self.temperature = temperature
+        self.stop = stop or None
         
-        if LANGCHAIN_AVAILABLE:
+        # Local or custom OpenAI-compatible endpoints are always called over plain HTTP
+        if LANGCHAIN_AVAILABLE and provider != "local" and base_url is None:
             # Use LangChain if available (preferred method)
+            # Retries are handled by our RetryPolicy, not the SDK clients
+            timeout = self.retry_policy.request_timeout
             if provider == "groq":
-                self.llm = ChatGroq(temperature=0.7, api_key=api_key, model_name=model)
+                self.llm = ChatGroq(
+                    temperature=temperature, api_key=api_key, model_name=model,
+                    max_tokens=self.max_tokens, max_retries=0, timeout=timeout,
+                )
             elif provider == "openai":
-                self.llm = ChatOpenAI(temperature=0.7, api_key=api_key, model=model)
+                self.llm = ChatOpenAI(
+                    temperature=temperature, api_key=api_key, model=model,
+                    max_tokens=self.max_tokens, max_retries=0, timeout=timeout,
+                )
             else:
                 raise ValueError(f"Unsupported provider: {provider}")
 
             self.prompt = ChatPromptTemplate.from_messages(
                 [
-                    (
-                        "system",
-                        """You are an expert in creating memorable mnemonics and providing vocabulary insights.
-                    You understand that mnemonics are most effective when provided in the user's native language,
-                    while synonyms and antonyms should be in the target learning language.""",
-                    ),
-                    (
-                        "human",
-                        """Create a memorable mnemonic for the word '{word}'.
-                Definition: {definition}
-
-                Requirements:
-                1. Create the mnemonic in {native_language} (user's native language)
-                2. Make it easy to remember for {native_language} speakers
-                3. Use culturally relevant word associations or stories that make sense to {native_language} speakers
-                4. Keep it concise (max 2 sentences)
-                5. Use simple language appropriate for a 5-year-old
-                6. Connect clearly to the word's meaning
-                7. Provide one synonym and one antonym in {target_language}
-
-                Output format:
-                - Mnemonic: (in {native_language})
-                - Synonym: (in {target_language})
-                - Antonym: (in {target_language}""",
-                    ),
+                    ("system", self.profile["system"]),
+                    ("human", self.profile["human"]),
                 ]
             )
 
-            self.chain = self.prompt | self.llm
+            self._bound_llm = self.llm.bind(stop=self.stop) if self.stop else self.llm
+            self.chain = self.prompt | self._bound_llm
             self.use_langchain = True
         else:
             # Fallback to direct HTTP API calls
             self.use_langchain = False
-            if provider not in ["groq", "openai"]:
-                raise ValueError(f"Unsupported provider: {provider}")
-            
-        self.system_prompt = """You are an expert in creating memorable mnemonics and providing vocabulary insights.
-You understand that mnemonics are most effective when provided in the user's native language,
-while synonyms and antonyms should be in the target learning language."""
 
     def create_mnemonic(
         self, 
@@ -273,92 +379,206 @@ while synonyms and antonyms should be in the target learning language."""
         native_language: str = "English",
         target_language: str = "English"
     ) -> dict:
-        """Generate a mnemonic, synonym, and antonym for the given word"""
-        
+        """Generate a mnemonic, synonym, and antonym for the given word.
+
+        The result also carries the ``usage`` (prompt/completion tokens) of the card.
+        Cached results cost no tokens, and identical requests already in flight
+        are shared rather than repeated.
+        """
+        key = mnemonic_cache_key(word, definition, native_language, target_language)
+        if self.cache is not None:
+            cached = self.cache.get_mnemonic(key)
+            if cached is not None:
+                cached["usage"] = {"prompt_tokens": 0, "completion_tokens": 0}
+                return cached
+
+        return _mnemonic_flights.do(
+            key,
+            self._generate_and_cache,
+            key,
+            word,
+            definition,
+            native_language,
+            target_language,
+        )
+
+    def create_sense_mnemonics(
+        self,
+        word: str,
+        definitions: List[str],
+        native_language: str = "English",
+        target_language: str = "English",
+    ) -> List[dict]:
+        """Generate one mnemonic per sense, all senses at once.
+
+        Senses run concurrently, bounded by ``max_concurrency``, so a word
+        with several senses takes about as long as a word with one. Each
+        sense is cached on its own. A failure on the first sense is raised;
+        later senses that fail get an empty result.
+        """
+        if len(definitions) <= 1:
+            return [
+                self.create_mnemonic(word, definition, native_language, target_language)
+                for definition in definitions
+            ]
+
+        # Pull cached senses from a shared cache in one round-trip
+        prefetch = getattr(self.cache, "prefetch_mnemonics", None)
+        if prefetch is not None:
+            prefetch(
+                [
+                    mnemonic_cache_key(word, definition, native_language, target_language)
+                    for definition in definitions
+                ]
+            )
+
+        def create(definition):
+            return self.create_mnemonic(word, definition, native_language, target_language)
+
+        with ThreadPoolExecutor(max_workers=min(len(definitions), self.max_concurrency)) as pool:
+            futures = [pool.submit(create, definition) for definition in definitions]
+            results = [futures[0].result()]
+            for index, future in enumerate(futures[1:], 2):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"MnemoMaker: no mnemonic for sense {index} of '{word}': {e}")
+                    results.append(
+                        {
+                            "mnemonic": "",
+                            "synonym": "",
+                            "antonym": "",
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0},
+                        }
+                    )
+        return results
+
+    def _generate_and_cache(
+        self,
+        key: str,
+        word: str,
+        definition: str,
+        native_language: str,
+        target_language: str,
+    ) -> dict:
+        result = None
+        try:
+            result = self._create_with_failover(word, definition, native_language, target_language)
+        finally:
+            if self.cache is not None:
+                if result is not None and result["mnemonic"]:
+                    self.cache.put_mnemonic(key, result)
+                else:
+                    # Let other clients of a shared cache try for themselves
+                    self.cache.release_mnemonic(key)
+        return result
+
+    def _create_with_failover(
+        self,
+        word: str,
+        definition: str,
+        native_language: str,
+        target_language: str,
+    ) -> dict:
+        try:
+            return self._create_mnemonic(word, definition, native_language, target_language)
+        except Exception as e:
+            can_fail_over = isinstance(e, (CircuitOpenError, DeadlineExceededError)) or is_retryable(e)
+            if self.fallback is None or not can_fail_over:
+                raise
+            print(f"MnemoMaker: {self.provider} unavailable ({e}), failing over to {self.fallback.provider}")
+            return self.fallback._create_with_failover(
+                word, definition, native_language, target_language
+            )
+
+    def _create_mnemonic(
+        self,
+        word: str,
+        definition: str,
+        native_language: str,
+        target_language: str,
+    ) -> dict:
+        variables = {
+            "word": word,
+            "definition": definition,
+            "native_language": native_language,
+            "target_language": target_language
+        }
+
         if self.use_langchain:
             # Use LangChain implementation
-            response = self.chain.invoke({
-                "word": word,
-                "definition": definition,
-                "native_language": native_language,
-                "target_language": target_language
-            })
-            return self._parse_response(response.content.strip())
+            response = self.retry_policy.call(
+                lambda timeout: self._invoke_chain(variables, timeout),
+                self.breaker,
+                wait_for_breaker=self.fallback is None,
+            )
+            response_text = response.content.strip()
+            usage = self._langchain_usage(response)
         else:
             # Use direct HTTP API calls
-            user_prompt = f"""Create a memorable mnemonic for the word '{word}'.
-Definition: {definition}
-
-Requirements:
-1. Create the mnemonic in {native_language} (user's native language)
-2. Make it easy to remember for {native_language} speakers
-3. Use culturally relevant word associations or stories that make sense to {native_language} speakers
-4. Keep it concise (max 2 sentences)
-5. Use simple language appropriate for a 5-year-old
-6. Connect clearly to the word's meaning
-7. Provide one synonym and one antonym in {target_language}
+            user_prompt = self.profile["human"].format(**variables)
+            response_text, usage = self._call_chat_api(user_prompt)
 
-Output format:
-- Mnemonic: (in {native_language})
-- Synonym: (in {target_language})
-- Antonym: (in {target_language}"""
+        result = self._parse_response(response_text)
+        result["usage"] = usage
+        return result
 
-            if self.provider == "groq":
-                response_text = self._call_groq_api(user_prompt)
-            elif self.provider == "openai":
-                response_text = self._call_openai_api(user_prompt)
-            else:
-                raise ValueError(f"Unsupported provider: {self.provider}")
-                
-            return self._parse_response(response_text)
-    
-    def _call_groq_api(self, user_prompt: str) -> str:
-        """Direct API call to Groq"""
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+    @staticmethod
+    def _langchain_usage(response) -> dict:
+        metadata = getattr(response, "usage_metadata", None) or {}
+        if metadata:
+            return {
+                "prompt_tokens": metadata.get("input_tokens", 0),
+                "completion_tokens": metadata.get("output_tokens", 0),
+            }
+        token_usage = getattr(response, "response_metadata", {}).get("token_usage") or {}
+        return {
+            "prompt_tokens": token_usage.get("prompt_tokens", 0),
+            "completion_tokens": token_usage.get("completion_tokens", 0),
         }
-        
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-        
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
     
-    def _call_openai_api(self, user_prompt: str) -> str:
-        """Direct API call to OpenAI"""
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+    def _invoke_chain(self, variables: dict, timeout: float):
+        # The per-attempt timeout shrinks as the retry deadline approaches;
+        # both SDK clients accept it per request
+        chain = self.prompt | self._bound_llm.bind(timeout=timeout)
+        with self._slots:
+            return chain.invoke(variables)
+
+    def _call_chat_api(self, user_prompt: str) -> Tuple[str, dict]:
+        """Direct call to an OpenAI-compatible chat completions endpoint,
+        retrying transient failures"""
+        url = f"{self.base_url}/chat/completions"
+        headers = {"Content-Type": "application/json"}
+        # Local servers usually run without authentication
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
         
         data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": self.system_prompt},
+                {"role": "system", "content": self.profile["system"]},
                 {"role": "user", "content": user_prompt}
             ],
-            "temperature": 0.7,
-            "max_tokens": 1000
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        if self.stop:
+            data["stop"] = self.stop
+
+        def post(timeout):
+            with self._slots:
+                response = requests.post(url, headers=headers, json=data, timeout=timeout)
+            response.raise_for_status()
+            return response
+
+        result = self.retry_policy.call(
+            post, self.breaker, wait_for_breaker=self.fallback is None
+        ).json()
+        usage = result.get("usage") or {}
+        return result["choices"][0]["message"]["content"], {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
         }
-        
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
 
     def _parse_response(self, response: str) -> dict:
         result = {"mnemonic": "", "synonym": "", "antonym": ""}
@@ -373,8 +593,35 @@ Output format:
         return result
 
 
-def get_word_data(word: str, dict_url: str) -> Dict:
-    """Get word data from Cambridge Dictionary"""
+def get_word_data(word: str, dict_url: str, cache=None) -> Optional[WordData]:
+    """Get word data from Cambridge Dictionary.
+
+    Pages found in ``cache`` (a ``WordCache``) are returned without a fetch,
+    and concurrent lookups of the same ``dict_url`` share a single fetch.
+    """
+    return _word_data_flights.do(dict_url, _lookup_word_data, word, dict_url, cache)
+
+
+def _lookup_word_data(word: str, dict_url: str, cache=None) -> Optional[WordData]:
+    if cache is not None:
+        word_data = cache.get_page(dict_url)
+        if word_data is not None:
+            # The page may have been cached for another form of the word
+            return word_data.replace(word=word)
+
+    word_data = None
+    try:
+        word_data = _fetch_word_data(word, dict_url)
+    finally:
+        if cache is not None:
+            if word_data is not None:
+                cache.put_page(dict_url, word_data)
+            else:
+                cache.release_page(dict_url)
+    return word_data
+
+
+def _fetch_word_data(word: str, dict_url: str) -> Optional[WordData]:
     try:
         url = f"https://dictionary.cambridge.org/dictionary/{dict_url}"
         headers = {
@@ -396,35 +643,47 @@ def get_word_data(word: str, dict_url: str) -> Dict:
         if not entry_body and not dictionary_entry:
             return None
         
-        result = {"word": word, "structure": [], "entries": [], "pronunciation": None}
+        structure = []
+        pronunciation = None
+        entries = []
+        audio = []
 
         structures = soup.find(class_="dpos")
         if structures:
-            result["structure"].append(structures.text.strip())
+            structure.append(structures.text.strip())
 
         ipa_pronunciation = soup.find(class_="ipa dipa")
         if ipa_pronunciation:
-            result["pronunciation"] = ipa_pronunciation.text.strip()
+            pronunciation = ipa_pronunciation.text.strip()
+
+        headword = soup.select_one(".headword .hw, .hw.dhw")
+        # Irregular inflections (ran, running); run-ons (happily) are words of their own
+        forms = [
+            form.text.strip()
+            for form in soup.select(".irreg-infls .inf")
+            if form.text.strip()
+        ]
+
+        # First UK and US recordings of the headword
+        for region in ("uk", "us"):
+            source = soup.select_one(f".{region}.dpron-i source[type='audio/mpeg']")
+            if source and source.get("src"):
+                audio.append((region, urljoin(url, source["src"])))
 
         for def_block in soup.find_all(class_="def-block"):
-            entry = {"definition": None, "translation": None, "examples": []}
-
             definition = def_block.find(class_="def")
             translation = def_block.find(class_="trans")
             examples = def_block.find_all(class_="eg")
 
-            if definition:
-                entry["definition"] = definition.text.strip()
-            if translation:
-                entry["translation"] = translation.text.strip()
-           
-            if examples:
-                entry["examples"].extend([ex.text.strip() for ex in examples])
+            entry = Entry(
+                definition.text.strip() if definition else None,
+                translation.text.strip() if translation else None,
+                [ex.text.strip() for ex in examples],
+            )
 
-            if entry["definition"] or entry["translation"]:  # Only add if there's content
-                result["entries"].append(entry)    
+            if entry.definition or entry.translation:  # Only add if there's content
+                entries.append(entry)
 
-            
 
         other_examples = []
         if soup.find_all(class_="degs"):
@@ -434,23 +693,64 @@ def get_word_data(word: str, dict_url: str) -> Dict:
                     other_examples.extend([ex.text.strip() for ex in deg_examples])
         
 
-        if other_examples:
-            result["other_examples"] = other_examples[:1]
-        
-        return result if result["entries"] else None
+        if not entries:
+            return None
+
+        return WordData(
+            word=word,
+            structure=structure,
+            entries=entries,
+            pronunciation=pronunciation,
+            other_examples=other_examples[:1],
+            audio=audio,
+            headword=headword.text.strip() if headword else None,
+            forms=dict.fromkeys(forms),
+        )
     except requests.RequestException as e:
         raise Exception(f"Cannot access Cambridge Dictionary: {str(e)}")
 
 
+NOTE_TAG = "cambridge_dictionary"
+# Notes whose mnemonic section is filled in; the rest are picked up for enrichment
+COMPLETE_TAG = "mnemomaker::complete"
+LANGUAGE_TAG_PREFIX = "mnemomaker::lang::"
+
+
+def language_tag(native_language: str, target_language: str) -> str:
+    return f"{LANGUAGE_TAG_PREFIX}{native_language.lower()}::{target_language.lower()}"
+
+
+def _html_text(value) -> str:
+    """Escape text from Cambridge, the LLM or a shared cache for card HTML,
+    which Anki renders as a web page, scripts included"""
+    return html.escape(str(value), quote=False)
+
+
 def create_anki_note(
-    word_data: Dict,
+    word_data: Union[WordData, Dict],
     deck_name: str,
     mnemonic: str,
     synonym: str,
     antonym: str,
     night_mode: bool,
+    audio_files: Optional[List[str]] = None,
+    languages: Optional[Tuple[str, str]] = None,
+    sense_mnemonics: Optional[List[Dict]] = None,
 ) -> Dict:
-    """Creates a theme-aware Anki note with dynamic styling"""
+    """Creates a theme-aware Anki note with dynamic styling.
+
+    ``audio_files`` are media filenames played as pronunciation on the front;
+    ``languages`` is the (native, target) pair, recorded as a tag.
+    ``sense_mnemonics`` is aligned with the entries: a mnemonic dict, or
+    None, per entry. The first one present is the Memory Hook at the top,
+    the others are shown in their entry's box. A sense whose mnemonic came
+    back empty gets an empty box, left for background enrichment to fill,
+    and keeps the note from being tagged complete.
+    """
+    word_data = WordData.coerce(word_data)
+    sense_mnemonics = list(sense_mnemonics or [])
+    top_sense = next((i for i, sense in enumerate(sense_mnemonics) if sense), None)
+    missing_senses = False
 
     # Theme configuration
     if night_mode:
@@ -493,16 +793,17 @@ def create_anki_note(
         antonym_border = "#BF616A"
 
     front = f"""<div style="text-align: center; padding: 20px; background-color: {card_bg};">
-        <h1 style="font-size: 2.5em; color: {heading_color}; margin-bottom: 10px;">{word_data['word']}</h1>
-        <div style="color: {pronunciation_color}; font-family: monospace; margin-bottom: 10px;">/{word_data.get('pronunciation', '')}/</div>
-        <div style="color: {structure_color}; font-style: italic;">{', '.join(word_data.get('structure', []))}</div>
+        <h1 style="font-size: 2.5em; color: {heading_color}; margin-bottom: 10px;">{_html_text(word_data.word)}</h1>
+        <div style="color: {pronunciation_color}; font-family: monospace; margin-bottom: 10px;">/{_html_text(word_data.pronunciation)}/</div>
+        <div style="color: {structure_color}; font-style: italic;">{_html_text(', '.join(word_data.structure))}</div>
+        {' '.join(f'[sound:{filename}]' for filename in dict.fromkeys(audio_files or []))}
     </div>"""
 
     back = f"""<div style="max-width: 600px; margin: 0 auto; padding: 20px; background-color: {card_bg};">
         <!-- Mnemonic Section -->
         <div style="background-color: {mnemonic_bg}; border-left: 4px solid {mnemonic_border}; padding: 15px; margin-bottom: 20px; border-radius: 4px;">
             <div style="color: {mnemonic_border}; font-weight: bold; margin-bottom: 5px;">💡 Memory Hook</div>
-            <div style="font-style: italic; color: {text_primary};">{mnemonic}</div>
+            <div style="font-style: italic; color: {text_primary};">{_html_text(mnemonic)}</div>
         </div>
 
         <!-- Synonym & Antonym Section -->
@@ -510,41 +811,62 @@ def create_anki_note(
             <div style="background-color: {synonym_bg}; border: 1px solid {synonym_border}; padding: 10px; border-radius: 4px;">
                 <div style="display: flex; flex-direction: column; justify-content: center; height: 100%;">
                     <div style="color: {synonym_border}; font-weight: bold; margin-bottom: 5px;">🔗 Synonym</div>
-                    <div style="color: {text_primary};">{synonym}</div>
+                    <div style="color: {text_primary};">{_html_text(synonym)}</div>
                 </div>
             </div>
             <div style="background-color: {antonym_bg}; border: 1px solid {antonym_border}; padding: 10px; border-radius: 4px;">
                 <div style="display: flex; flex-direction: column; justify-content: center; height: 100%;">
                     <div style="color: {antonym_border}; font-weight: bold; margin-bottom: 5px;">🧭 Antonym</div>
-                    <div style="color: {text_primary};">{antonym}</div>
+                    <div style="color: {text_primary};">{_html_text(antonym)}</div>
                 </div>
             </div>
         </div>
         <!-- Definitions Section -->
         <div style="display: grid; gap: 20px;">"""
 
-    for idx, entry in enumerate(word_data.get("entries", []), 1):
+    for idx, entry in enumerate(word_data.entries, 1):
         back += f"""
             <div style="border: 1px solid {box_border}; padding: 15px; border-radius: 8px;">
                 <div style="display: flex; gap: 10px; align-items: baseline; margin-bottom: 10px;">
                     <span style="background-color: {idx_color}; color: white; padding: 2px 8px; border-radius: 12px; font-size: 0.8em;">#{idx}</span>
-                    <div style="font-weight: 500; color: {heading_color};">{entry['definition']}</div>
+                    <div style="font-weight: 500; color: {heading_color};">{_html_text(entry.definition)}</div>
                 </div>
                 
                 <div style="color: {translation_color}; margin-bottom: 10px; padding-left: 25px;">
-                    {entry['translation']}
+                    {_html_text(entry.translation)}
                 </div>"""
 
-        if entry.get("examples"):
+        sense = sense_mnemonics[idx - 1] if idx <= len(sense_mnemonics) else None
+        if idx - 1 != top_sense and sense is not None and not sense.get("mnemonic"):
+            missing_senses = True
+            back += f"""
+                <div style="background-color: {mnemonic_bg}; border-left: 3px solid {mnemonic_border}; padding: 8px 12px; margin: 0 0 10px 25px; border-radius: 4px;">
+                    <div style="font-style: italic; color: {text_primary};">💡 </div>
+                    <div style="color: {text_secondary}; font-size: 0.9em; margin-top: 5px;"></div></div>"""
+        elif idx - 1 != top_sense and sense and sense.get("mnemonic"):
+            related = " · ".join(
+                f"{label} {_html_text(sense[key])}"
+                for label, key in (("🔗", "synonym"), ("🧭", "antonym"))
+                if sense.get(key)
+            )
+            back += f"""
+                <div style="background-color: {mnemonic_bg}; border-left: 3px solid {mnemonic_border}; padding: 8px 12px; margin: 0 0 10px 25px; border-radius: 4px;">
+                    <div style="font-style: italic; color: {text_primary};">💡 {_html_text(sense["mnemonic"])}</div>"""
+            if related:
+                back += f"""
+                    <div style="color: {text_secondary}; font-size: 0.9em; margin-top: 5px;">{related}</div>"""
+            back += "</div>"
+
+        if entry.examples:
             back += (
                 """<div style="margin-top: 10px; padding-left: 25px;">
                 <div style="color: %s; font-size: 0.9em; margin-bottom: 5px;">Examples:</div>
                 <ul style="list-style-type: none; padding: 0; margin: 0;">"""
                 % text_secondary
             )
-            for example in entry["examples"]:
+            for example in entry.examples:
                 back += f"""<li style="margin-bottom: 5px; color: {text_primary}; padding-left: 15px; border-left: 2px solid {example_border};">
-                    {example}
+                    {_html_text(example)}
                 </li>"""
             back += "</ul></div>"
 
@@ -552,10 +874,16 @@ def create_anki_note(
 
     back += """</div></div>"""
 
+    tags = [NOTE_TAG]
+    if mnemonic and not missing_senses:
+        tags.append(COMPLETE_TAG)
+    if languages:
+        tags.append(language_tag(*languages))
+
     return {
         "deckName": deck_name,
         "modelName": "Basic",
         "fields": {"Front": front, "Back": back},
         "options": {"allowDuplicate": True},
-        "tags": ["cambridge_dictionary"],
+        "tags": tags,
     }
@@ -0,0 +1,394 @@
+"""Idle-time enrichment of MnemoMaker notes that lack a mnemonic.
+
+Notes created from a manual definition, or while the LLM was failing, end up
+with empty mnemonic/synonym/antonym boxes, or empty boxes for later senses
+whose mnemonic failed. While Anki sits untouched on the
+deck browser or overview, with no browser or editor window open, the
+scheduler finds those notes with a search on the card layout (so notes from
+before tagging existed are found too) and fills them in, a few at a time and
+within a daily request/token budget. Starting a review pauses it
+immediately, and results that arrive after that are dropped.
+"""
+import datetime
+import html
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import aqt
+from aqt import gui_hooks, mw
+from aqt.qt import QEvent, QObject, QTimer
+
+from .camanki import COMPLETE_TAG, LANGUAGE_TAG_PREFIX
+
+# Notes whose Memory Hook box or a sense box is empty, found by layout rather
+# than by tag: notes created before tagging was added carry no tags at all.
+# The plain text and tag terms come first, so the regex only runs on
+# MnemoMaker notes that aren't known to be complete.
+INCOMPLETE_SEARCH = (
+    f'"Memory Hook" -tag:{COMPLETE_TAG} '
+    '("Back:re:Memory Hook</div>[[:space:]]*<div[^>]*>[[:space:]]*</div>" OR "💡 </div>")'
+)
+IDLE_STATES = ("deckBrowser", "overview")
+# Windows that may hold a note in an editor
+EDITING_DIALOGS = ("Browser", "AddCards", "EditCurrent")
+INPUT_EVENTS = (
+    QEvent.Type.KeyPress,
+    QEvent.Type.MouseButtonPress,
+    QEvent.Type.Wheel,
+)
+
+_WORD = re.compile(r"<h1[^>]*>(.*?)</h1>", re.S)
+_FIRST_DEFINITION = re.compile(r">#1</span>\s*<div[^>]*>(.*?)</div>", re.S)
+_SECTIONS = {
+    "mnemonic": re.compile(r"(💡 Memory Hook</div>\s*<div[^>]*>)(.*?)(</div>)", re.S),
+    "synonym": re.compile(r"(🔗 Synonym</div>\s*<div[^>]*>)(.*?)(</div>)", re.S),
+    "antonym": re.compile(r"(🧭 Antonym</div>\s*<div[^>]*>)(.*?)(</div>)", re.S),
+}
+# An entry whose sense box create_anki_note left empty
+_EMPTY_SENSE = re.compile(
+    r">#(\d+)</span>\s*<div[^>]*>([^<]*)</div>\s*</div>\s*<div[^>]*>[^<]*</div>"
+    r"\s*<div[^>]*>\s*<div[^>]*>💡 (</div>\s*<div[^>]*>)(</div>)"
+)
+_TAGS = re.compile(r"<[^>]+>")
+
+
+def _text(fragment: str) -> str:
+    return html.unescape(_TAGS.sub("", fragment)).strip()
+
+
+def parse_note(front: str, back: str) -> Optional[Dict]:
+    """Word, first definition and what is missing from a MnemoMaker note:
+    whether the Memory Hook is empty, and the (number, definition) of each
+    sense whose box is. None if the note no longer has the layout
+    ``create_anki_note`` produces."""
+    word = _WORD.search(front)
+    definition = _FIRST_DEFINITION.search(back)
+    sections = [pattern.search(back) for pattern in _SECTIONS.values()]
+    if not word or not definition or not all(sections):
+        return None
+    return {
+        "word": _text(word.group(1)),
+        "definition": _text(definition.group(1)),
+        "needs_mnemonic": not _text(sections[0].group(2)),
+        "missing_senses": [
+            (int(match.group(1)), _text(match.group(2))) for match in _EMPTY_SENSE.finditer(back)
+        ],
+    }
+
+
+def apply_mnemonic(back: str, mnemonic_data: Dict) -> str:
+    """Fill the mnemonic, synonym and antonym boxes of a note's back"""
+    for field, pattern in _SECTIONS.items():
+        value = html.escape(mnemonic_data.get(field, ""), quote=False)
+        back = pattern.sub(lambda m: m.group(1) + value + m.group(3), back, count=1)
+    return back
+
+
+def apply_sense_mnemonic(back: str, number: int, mnemonic_data: Dict) -> str:
+    """Fill the empty box of sense ``number`` (1-based, as shown on the card)"""
+    mnemonic = html.escape(mnemonic_data.get("mnemonic", ""), quote=False)
+    related = " · ".join(
+        f"{label} {html.escape(mnemonic_data[key], quote=False)}"
+        for label, key in (("🔗", "synonym"), ("🧭", "antonym"))
+        if mnemonic_data.get(key)
+    )
+
+    def fill(match):
+        if int(match.group(1)) != number:
+            return match.group(0)
+        start, end = match.start(3) - match.start(0), match.start(4) - match.start(0)
+        text = match.group(0)
+        return text[:start] + mnemonic + text[start:end] + related + text[end:]
+
+    return _EMPTY_SENSE.sub(fill, back)
+
+
+def note_languages(tags: List[str], default: tuple) -> tuple:
+    """(native, target) display names from a note's language tag"""
+    for tag in tags:
+        if tag.lower().startswith(LANGUAGE_TAG_PREFIX):
+            parts = tag[len(LANGUAGE_TAG_PREFIX):].split("::")
+            if len(parts) == 2:
+                return parts[0].capitalize(), parts[1].capitalize()
+    return default
+
+
+class DailyBudget:
+    """Requests and tokens spent on enrichment today, persisted in a JSON file"""
+
+    def __init__(self, path: str, max_requests: int, max_tokens: int):
+        self.path = path
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._state = {"date": "", "requests": 0, "tokens": 0}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._state.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+
+    def _roll_over(self):
+        today = datetime.date.today().isoformat()
+        if self._state["date"] != today:
+            self._state = {"date": today, "requests": 0, "tokens": 0}
+
+    def has_room(self) -> bool:
+        with self._lock:
+            self._roll_over()
+            return (
+                self._state["requests"] < self.max_requests
+                and self._state["tokens"] < self.max_tokens
+            )
+
+    def record(self, usage: Dict):
+        with self._lock:
+            self._roll_over()
+            self._state["requests"] += 1
+            self._state["tokens"] += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+
+
+def editing_window_open() -> bool:
+    """Whether the browser or an add/edit window is open"""
+    registry = getattr(aqt.dialogs, "_dialogs", {})
+    return any(registry.get(name, (None, None))[1] is not None for name in EDITING_DIALOGS)
+
+
+class ActivityFilter(QObject):
+    """Application-wide event filter noting when the user last gave input"""
+
+    def __init__(self, on_activity: Callable, parent=None):
+        super().__init__(parent)
+        self.on_activity = on_activity
+
+    def eventFilter(self, obj, event) -> bool:
+        if event.type() in INPUT_EVENTS:
+            self.on_activity()
+        return False
+
+
+class EnrichmentScheduler:
+    def __init__(
+        self,
+        config: Dict,
+        generator_factory: Callable,
+        budget: DailyBudget,
+        usage_log_factory: Optional[Callable] = None,
+    ):
+        self.config = config
+        # Returns a MnemonicGenerator, or None when no provider is configured
+        self.generator_factory = generator_factory
+        self.budget = budget
+        # Returns the UsageLog enriched notes are recorded in
+        self.usage_log_factory = usage_log_factory
+        self._paused = threading.Event()
+        self._running = False
+        self._last_activity = time.monotonic()
+        self._skipped = set()
+        # Note ids from the last search still to be looked at
+        self._candidates: List[int] = []
+        self._searching = False
+        self._timer = None
+        self._activity_filter = None
+
+    def start(self):
+        if not self.config.get("enrich_enabled", False) or self._timer is not None:
+            return
+        gui_hooks.state_will_change.append(self._on_state_change)
+        self._activity_filter = ActivityFilter(self._on_activity, mw)
+        mw.app.installEventFilter(self._activity_filter)
+        self._timer = QTimer(mw)
+        self._timer.timeout.connect(self.tick)
+        self._timer.start(int(self.config.get("enrich_check_seconds", 60) * 1000))
+
+    def stop(self):
+        self._paused.set()
+        self._candidates = []
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+            gui_hooks.state_will_change.remove(self._on_state_change)
+            mw.app.removeEventFilter(self._activity_filter)
+            self._activity_filter = None
+
+    def _on_activity(self):
+        self._last_activity = time.monotonic()
+
+    def _on_state_change(self, new_state, old_state):
+        self._on_activity()
+        if new_state not in IDLE_STATES:
+            # Background work must never compete with a review session
+            self._paused.set()
+
+    def can_update_notes(self) -> bool:
+        """Whether notes can be changed without racing the user: no review,
+        no modal dialog and no window that may be editing a note"""
+        return (
+            mw.col is not None
+            and mw.state in IDLE_STATES
+            and mw.app.activeModalWidget() is None
+            and not editing_window_open()
+        )
+
+    def is_idle(self) -> bool:
+        idle_for = time.monotonic() - self._last_activity
+        return self.can_update_notes() and idle_for >= self.config.get("enrich_idle_seconds", 120)
+
+    def tick(self):
+        if self._running or self._searching or not self.is_idle() or not self.budget.has_room():
+            return
+        if not self._candidates:
+            self._search()
+            return
+
+        batch_size = self.config.get("enrich_batch_size", 5)
+        items = []
+        while self._candidates and len(items) < batch_size:
+            note_id = self._candidates.pop(0)
+            if note_id in self._skipped:
+                continue
+            try:
+                note = mw.col.get_note(note_id)
+            except Exception:
+                # Deleted since the search
+                continue
+            parsed = parse_note(note["Front"], note["Back"])
+            if parsed is None or not (parsed["needs_mnemonic"] or parsed["missing_senses"]):
+                self._skipped.add(note_id)
+                continue
+            parsed["note_id"] = note_id
+            parsed["languages"] = note_languages(
+                note.tags,
+                (
+                    self.config.get("enrich_native_language", "English"),
+                    self.config.get("enrich_target_language", "English"),
+                ),
+            )
+            items.append(parsed)
+        if not items:
+            return
+
+        generator = self.generator_factory()
+        if generator is None:
+            return
+
+        self._running = True
+        self._paused.clear()
+        mw.taskman.run_in_background(
+            lambda: self._generate(generator, items), self._on_generated
+        )
+
+    def _search(self):
+        """Collect candidate notes off the main thread; later ticks work
+        through them before searching again"""
+        self._searching = True
+        mw.taskman.run_in_background(
+            lambda: mw.col.find_notes(INCOMPLETE_SEARCH), self._on_searched
+        )
+
+    def _on_searched(self, future):
+        self._searching = False
+        try:
+            note_ids = future.result()
+        except Exception as e:
+            print(f"MnemoMaker: enrichment search failed: {e}")
+            return
+        if self._timer is None:
+            # The profile closed while searching
+            return
+        self._candidates = [note_id for note_id in note_ids if note_id not in self._skipped]
+
+    def _generate(self, generator, items: List[Dict]) -> List[Dict]:
+        delay = self.config.get("enrich_delay_seconds", 5)
+        results = []
+        for item in items:
+            # (sense number, definition); None stands for the Memory Hook
+            wanted = [(None, item["definition"])] if item["needs_mnemonic"] else []
+            wanted += item["missing_senses"]
+            result = {
+                "note_id": item["note_id"],
+                "word": item["word"],
+                "mnemonic": None,
+                "senses": {},
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0},
+                "provider": generator.provider,
+                "model": generator.model,
+            }
+            for number, definition in wanted:
+                if self._paused.is_set() or not self.budget.has_room():
+                    break
+                try:
+                    mnemonic_data = generator.create_mnemonic(
+                        item["word"],
+                        definition,
+                        native_language=item["languages"][0],
+                        target_language=item["languages"][1],
+                    )
+                except Exception as e:
+                    print(f"MnemoMaker: could not enrich '{item['word']}': {e}")
+                    self._skipped.add(item["note_id"])
+                    break
+                if any(mnemonic_data["usage"].values()):
+                    # Cached results (e.g. from a postponed batch) cost nothing
+                    self.budget.record(mnemonic_data["usage"])
+                    for key in result["usage"]:
+                        result["usage"][key] += mnemonic_data["usage"].get(key, 0)
+                if not mnemonic_data["mnemonic"]:
+                    self._skipped.add(item["note_id"])
+                elif number is None:
+                    result["mnemonic"] = mnemonic_data
+                else:
+                    result["senses"][number] = mnemonic_data
+            if result["mnemonic"] or result["senses"]:
+                results.append(result)
+            # Waiting on the pause event lets a review start interrupt the delay
+            if self._paused.is_set() or self._paused.wait(delay):
+                break
+        return results
+
+    def _on_generated(self, future):
+        self._running = False
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"MnemoMaker: enrichment failed: {e}")
+            return
+        if results and (self._paused.is_set() or not self.can_update_notes()):
+            # The user came back meanwhile; the mnemonics are cached, so the
+            # next idle tick applies them without spending tokens again
+            print(f"MnemoMaker: postponed {len(results)} enriched notes, Anki is in use")
+            self._candidates[:0] = [result["note_id"] for result in results]
+            return
+
+        for result in results:
+            try:
+                note = mw.col.get_note(result["note_id"])
+            except Exception:
+                continue
+            back = note["Back"]
+            if result["mnemonic"]:
+                back = apply_mnemonic(back, result["mnemonic"])
+            for number, mnemonic_data in result["senses"].items():
+                back = apply_sense_mnemonic(back, number, mnemonic_data)
+            note["Back"] = back
+            parsed = parse_note(note["Front"], back)
+            if parsed and not (parsed["needs_mnemonic"] or parsed["missing_senses"]):
+                note.add_tag(COMPLETE_TAG)
+            mw.col.update_note(note)
+            if self.usage_log_factory is not None:
+                self.usage_log_factory().record(
+                    result["note_id"],
+                    result["word"],
+                    result["provider"],
+                    result["model"],
+                    result["usage"],
+                )
+        if results:
+            print(f"MnemoMaker: enriched {len(results)} notes in the background")
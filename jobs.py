@@ -0,0 +1,272 @@
+"""Durable, resumable batch jobs backed by SQLite.
+
+Every word of a list import is tracked as an item that moves through
+``pending -> fetched -> generated -> inserted``. Intermediate results (the
+Cambridge word data and the generated mnemonic) are stored with the item, so
+a job interrupted by a crash, an API quota or a closed window resumes
+without repeating fetches or LLM calls.
+"""
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .records import WordData
+
+PENDING = "pending"
+FETCHED = "fetched"
+GENERATED = "generated"
+INSERTED = "inserted"
+FAILED = "failed"
+
+STATES = (PENDING, FETCHED, GENERATED, INSERTED, FAILED)
+UNFINISHED_STATES = (PENDING, FETCHED, GENERATED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    position INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    dict_url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    word_data BLOB,
+    mnemonic TEXT,
+    note_id INTEGER,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_job_state ON items (job_id, state, position);
+"""
+
+
+class JobQueue:
+    """Persistent work queue for batch card creation"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params: Iterable = ()) -> sqlite3.Cursor:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, tuple(params))
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def create_job(self, words: List[Dict], params: Dict) -> int:
+        """Create a job from ``{"word", "dict_url"}`` items and return its id"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (params, created_at) VALUES (?, ?)",
+                (json.dumps(params), now),
+            )
+            job_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO items (job_id, position, word, dict_url, state, stage, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, position, item["word"], item["dict_url"], PENDING, PENDING, now)
+                    for position, item in enumerate(words)
+                ],
+            )
+        return job_id
+
+    def job(self, job_id: int) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "id": row["id"],
+            "params": json.loads(row["params"]),
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+        }
+
+    def unfinished_jobs(self) -> List[int]:
+        """Ids of jobs that still have items left to process"""
+        placeholders = ",".join("?" * len(UNFINISHED_STATES))
+        rows = self._query(
+            f"SELECT DISTINCT job_id FROM items WHERE state IN ({placeholders}) ORDER BY job_id",
+            UNFINISHED_STATES,
+        )
+        return [row["job_id"] for row in rows]
+
+    def mark_started(self, job_id: int):
+        """Start a new run of the job; throughput is measured from here"""
+        self._execute("UPDATE jobs SET started_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def items(self, job_id: int, states: Iterable[str], limit: Optional[int] = None) -> List[Dict]:
+        states = tuple(states)
+        placeholders = ",".join("?" * len(states))
+        sql = (
+            f"SELECT * FROM items WHERE job_id = ? AND state IN ({placeholders})"
+            " ORDER BY position"
+        )
+        params = (job_id,) + states
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [self._item_from_row(row) for row in self._query(sql, params)]
+
+    @staticmethod
+    def _item_from_row(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "word": row["word"],
+            "dict_url": row["dict_url"],
+            "state": row["state"],
+            "word_data": WordData.from_bytes(row["word_data"]) if row["word_data"] else None,
+            "mnemonic": json.loads(row["mnemonic"]) if row["mnemonic"] else None,
+            "note_id": row["note_id"],
+            "error": row["error"],
+        }
+
+    def _advance(self, item_id: int, state: str, column: Optional[str] = None, value=None):
+        assignments = "state = ?, stage = ?, error = NULL, updated_at = ?"
+        params = [state, state, time.time()]
+        if column:
+            assignments += f", {column} = ?"
+            params.append(value)
+        self._execute(f"UPDATE items SET {assignments} WHERE id = ?", params + [item_id])
+
+    def mark_fetched(self, item_id: int, word_data: WordData):
+        self._advance(item_id, FETCHED, "word_data", word_data.to_bytes())
+
+    def mark_generated(self, item_id: int, mnemonic_data: Dict):
+        self._advance(item_id, GENERATED, "mnemonic", json.dumps(mnemonic_data))
+
+    def mark_inserted(self, item_id: int, note_id: int):
+        self._advance(item_id, INSERTED, "note_id", note_id)
+
+    def mark_failed(self, item_id: int, error: str):
+        """Fail an item but keep the stage it reached, so a retry resumes there"""
+        self._execute(
+            "UPDATE items SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+            (FAILED, error, time.time(), item_id),
+        )
+
+    def retry_failed(self, job_id: int) -> int:
+        """Put every failed item back at the last stage it completed"""
+        cursor = self._execute(
+            "UPDATE items SET state = stage, error = NULL, updated_at = ?"
+            " WHERE job_id = ? AND state = ?",
+            (time.time(), job_id, FAILED),
+        )
+        return cursor.rowcount
+
+    def discard_job(self, job_id: int):
+        """Drop a job and its remaining work; notes already inserted stay"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def stats(self, job_id: int) -> Dict:
+        """Counts per state plus throughput (items/min) and ETA (seconds) of the current run"""
+        counts = {state: 0 for state in STATES}
+        for row in self._query(
+            "SELECT state, COUNT(*) AS n FROM items WHERE job_id = ? GROUP BY state", (job_id,)
+        ):
+            counts[row["state"]] = row["n"]
+
+        job = self.job(job_id) or {}
+        started_at = job.get("started_at")
+        throughput = 0.0
+        if started_at:
+            processed = self._query(
+                "SELECT COUNT(*) AS n FROM items WHERE job_id = ? AND state IN (?, ?, ?)"
+                " AND updated_at >= ?",
+                (job_id, GENERATED, INSERTED, FAILED, started_at),
+            )[0]["n"]
+            elapsed = time.time() - started_at
+            if elapsed > 0:
+                throughput = processed * 60 / elapsed
+
+        remaining = counts[PENDING] + counts[FETCHED]
+        return {
+            "total": sum(counts.values()),
+            "counts": counts,
+            "throughput": throughput,
+            "eta": remaining * 60 / throughput if throughput else None,
+        }
+
+
+def process_batch(
+    queue: JobQueue,
+    job_id: int,
+    fetch: Callable[[str, str], Optional[WordData]],
+    generate: Callable[[str, WordData], Dict],
+    batch_size: int = 10,
+    concurrency: int = 1,
+    prefetch: Optional[Callable[[List[str]], object]] = None,
+) -> int:
+    """Move up to ``batch_size`` items through the fetch and generate stages.
+
+    Fetches run one at a time to respect Cambridge's rate limits; generation
+    runs ``concurrency`` items at once. Runs off the main thread; inserting
+    the generated notes is left to the caller. ``prefetch``, if given, is
+    called once with the ``dict_url`` of every item still to be fetched, so
+    a shared cache can be queried in a single round-trip. Returns the number
+    of items that were processed.
+    """
+    items = queue.items(job_id, (PENDING, FETCHED), limit=batch_size)
+    if prefetch is not None:
+        pending = [item["dict_url"] for item in items if item["state"] == PENDING]
+        if pending:
+            try:
+                prefetch(pending)
+            except Exception as e:
+                print(f"MnemoMaker: prefetch failed: {e}")
+
+    fetched = []
+    for item in items:
+        if item["state"] == FETCHED:
+            fetched.append(item)
+            continue
+        try:
+            word_data = fetch(item["word"], item["dict_url"])
+        except Exception as e:
+            queue.mark_failed(item["id"], str(e))
+            continue
+        if word_data is None:
+            queue.mark_failed(item["id"], "Not found in the Cambridge Dictionary")
+            continue
+        queue.mark_fetched(item["id"], word_data)
+        item["word_data"] = word_data
+        fetched.append(item)
+
+    def generate_item(item):
+        try:
+            queue.mark_generated(item["id"], generate(item["word"], item["word_data"]))
+        except Exception as e:
+            queue.mark_failed(item["id"], str(e))
+
+    if concurrency > 1 and len(fetched) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(generate_item, fetched))
+    else:
+        for item in fetched:
+            generate_item(item)
+
+    return len(items)
@@ -1,4 +1,8 @@
-from aqt import mw
+import datetime
+import os
+import shutil
+
+from aqt import gui_hooks, mw
 from aqt.qt import (
     QDialog,
     QVBoxLayout,
@@ -10,14 +14,24 @@ from aqt.qt import (
     QAction,
     QMessageBox,
     QTextEdit,
+    QFileDialog,
 )
 from aqt.utils import showInfo, qconnect
-from .camanki import MnemonicGenerator, get_word_data, create_anki_note
+from .camanki import create_anki_note, user_files_path
+from .enrich import DailyBudget, EnrichmentScheduler
+from .jobs import FAILED, GENERATED, process_batch
+from .media import wait_for_audio
+from .packs import PACK_EXTENSION, WordPack, export_pack
+from .records import Entry, WordData
+from .session import MnemoSession, packs_dir
 
 
 # Load config using Anki's addon manager
 config = mw.addonManager.getConfig(__name__)
 
+# Clients, caches and the deck index, kept between dialog opens
+session = MnemoSession(config)
+
 
 class CambridgeDictionaryDialog(QDialog):
     def __init__(self, parent=None):
@@ -75,16 +89,30 @@ class CambridgeDictionaryDialog(QDialog):
         }
 
         # Define llm parameters
-        self.llm_providers = ["Groq", "OpenAI"]
+        self.llm_providers = ["Groq", "OpenAI", "Local"]
         self.llm_models = {
             "Groq": ["llama-3.3-70b-versatile", "deepseek-r1-distill-llama-70b"],
             "OpenAI": ["o1-mini", "gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo"],
+            # Whatever model the local server has loaded
+            "Local": [config.get("local_model", "local-model")],
         }
 
+        # Theme and deck index the widgets were last built for
+        self._night_mode = None
+        self._decks_version = None
+
         self.setup_ui()
         self.mnemonic_generator = None
         self.initialize_llm()
 
+    def refresh(self):
+        """Bring the reused dialog up to date before it is shown again"""
+        if self._night_mode != mw.pm.night_mode():
+            self.apply_theme_styles()
+        self.update_deck_list()
+        self.update_usage_label()
+        self.word_input.setFocus()
+
     def setup_ui(self):
         self.setWindowTitle("MnemoMaker - AI-Powered Flashcard Creator")
         self.setMinimumWidth(500)
@@ -146,11 +174,21 @@ class CambridgeDictionaryDialog(QDialog):
         deck_layout.addWidget(self.deck_combo)
         layout.addLayout(deck_layout)
 
+        self.usage_label = QLabel()
+        layout.addWidget(self.usage_label)
+        self.update_usage_label()
+
         # Buttons
         btn_layout = QHBoxLayout()
         self.add_btn = QPushButton("Create Card")
+        self.import_btn = QPushButton("Import List")
+        self.export_pack_btn = QPushButton("Export Pack")
+        self.import_pack_btn = QPushButton("Import Pack")
         self.cancel_btn = QPushButton("Close")
         btn_layout.addWidget(self.add_btn)
+        btn_layout.addWidget(self.import_btn)
+        btn_layout.addWidget(self.export_pack_btn)
+        btn_layout.addWidget(self.import_pack_btn)
         btn_layout.addWidget(self.cancel_btn)
         layout.addLayout(btn_layout)
 
@@ -161,6 +199,9 @@ class CambridgeDictionaryDialog(QDialog):
         qconnect(self.target_combo.currentTextChanged, self.update_word_label)
         qconnect(self.provider_combo.currentTextChanged, self.update_models)
         qconnect(self.add_btn.clicked, self.create_card)
+        qconnect(self.import_btn.clicked, self.import_word_list)
+        qconnect(self.export_pack_btn.clicked, self.export_word_pack)
+        qconnect(self.import_pack_btn.clicked, self.import_word_pack)
         qconnect(self.cancel_btn.clicked, self.reject)
 
         self.update_target_languages()
@@ -172,7 +213,8 @@ class CambridgeDictionaryDialog(QDialog):
         self.word_label.setText(f"Word in {target_language}:")  
 
     def apply_theme_styles(self):
-        if mw.pm.night_mode():
+        self._night_mode = mw.pm.night_mode()
+        if self._night_mode:
             self.setStyleSheet(
                 """
                 QDialog { background-color: #2E3440; color: #D8DEE9; }
@@ -217,18 +259,15 @@ class CambridgeDictionaryDialog(QDialog):
 
     def validate_api_keys(self):
         provider = self.provider_combo.currentText().lower()
-        api_key = config.get(f"{provider}_api_key", "")
 
-        if not api_key or api_key.startswith("your-"):
+        if not session.has_api_key(provider):
             showInfo(
                 f"Please set your {self.provider_combo.currentText()} API key in add-on config!"
             )
             return False
 
         try:
-            self.mnemonic_generator = MnemonicGenerator(
-                provider=provider, api_key=api_key, model=self.model_combo.currentText()
-            )
+            self.mnemonic_generator = session.generator(provider, self.model_combo.currentText())
             return True
         except Exception as e:
             showInfo(f"Error initializing {provider}:\n{str(e)}")
@@ -238,6 +277,7 @@ class CambridgeDictionaryDialog(QDialog):
         provider = self.provider_combo.currentText()
         self.model_combo.clear()
         self.model_combo.addItems(self.llm_models.get(provider, []))
+        self.model_combo.setEditable(provider == "Local")
         self.validate_api_keys()
 
     def update_target_languages(self):
@@ -252,25 +292,37 @@ class CambridgeDictionaryDialog(QDialog):
         self.update_word_label()
 
     def update_deck_list(self):
+        """Refill the deck list, only if the session's deck index changed"""
+        decks = session.decks()
+        if self._decks_version == session.decks_version:
+            return
+
+        selected = self.deck_combo.currentText() or config.get("deck_name")
         self.deck_combo.clear()
-        decks = sorted(mw.col.decks.all_names_and_ids(), key=lambda x: x.name)
-        for deck in decks:
-            self.deck_combo.addItem(deck.name, deck.id)
-        if config.get("deck_name"):
-            index = self.deck_combo.findText(config["deck_name"])
+        for name, deck_id in decks:
+            self.deck_combo.addItem(name, deck_id)
+        if selected:
+            index = self.deck_combo.findText(selected)
             if index >= 0:
                 self.deck_combo.setCurrentIndex(index)
+        self._decks_version = session.decks_version
 
-    def get_dict_url(self, word):
+    def dictionary_name(self):
+        """Cambridge dictionary for the selected languages, e.g. english-turkish"""
         source_lang = next(k for k, v in self.language_names.items() if v == self.source_combo.currentText())
         target_lang = next(k for k, v in self.language_names.items() if v == self.target_combo.currentText())
-        
+
         # Handle Turkish edge case (english-turkish is fixed)
         if source_lang == "turkish":
-            return f"english-turkish/{word.lower().replace(' ', '-')}"
-            
+            return "english-turkish"
         dict_format = self.language_config[source_lang]["dict_format"]
-        return f"{dict_format.format(target=target_lang)}/{word.lower().replace(' ', '-')}"
+        return dict_format.format(target=target_lang)
+
+    def get_dict_url(self, word):
+        dict_url = f"{self.dictionary_name()}/{word.lower().replace(' ', '-')}"
+
+        # Inflected forms (ran, running) go to their headword's page
+        return session.word_cache().resolve_dict_url(dict_url)
     
 
     def handle_missing_word(self, word):
@@ -327,17 +379,14 @@ class CambridgeDictionaryDialog(QDialog):
             cancel_btn.clicked.connect(on_cancel)
             
             if dialog.exec() == QDialog.DialogCode.Accepted and definition_edit.toPlainText().strip():
-                # Create a word_data structure with manual input
-                return {
-                    "word": word,
-                    "structure": [],
-                    "entries": [{
-                        "definition": definition_edit.toPlainText().strip(),
-                        "translation": translation_edit.toPlainText().strip(),
-                        "examples": []
-                    }],
-                    "pronunciation": None
-                }
+                # Create a word_data record with manual input
+                return WordData(
+                    word=word,
+                    entries=[Entry(
+                        definition_edit.toPlainText().strip(),
+                        translation_edit.toPlainText().strip(),
+                    )],
+                )
             
         return "cancel"
     
@@ -353,12 +402,15 @@ class CambridgeDictionaryDialog(QDialog):
         try:
             # Get the deck name and ensure it exists
             deck_name = self.deck_combo.currentText()
+            if mw.col.decks.id_for_name(deck_name) is None:
+                # Creating the deck here isn't an op, so no hook reports it
+                session.invalidate_decks()
             deck_id = mw.col.decks.id(
                 deck_name, create=True
             )  # This creates the deck if it doesn't exist
             mw.col.decks.select(deck_id)
 
-            word_data = get_word_data(word, self.get_dict_url(word))
+            word_data = session.lookup_word(word, self.get_dict_url(word))
 
             if word_data is None:
                 response = self.handle_missing_word(word)
@@ -366,35 +418,23 @@ class CambridgeDictionaryDialog(QDialog):
                     return
                 word_data = response
 
-            mnemonic = synonym = antonym = ""
-
-            if word_data.get("entries"):
-                mnemonic_data = self.mnemonic_generator.create_mnemonic(
-                    word,
-                    word_data["entries"][0]["definition"],
-                    native_language=self.source_combo.currentText(),  # Native = source language
-                    target_language=self.target_combo.currentText()   # Target = learning language
-                )
-                    
-                mnemonic = mnemonic_data["mnemonic"]
-                synonym = mnemonic_data["synonym"]
-                antonym = mnemonic_data["antonym"]
-
-            note = create_anki_note(
+            mnemonic_data = self.generate_card_content(
+                word,
+                word_data,
+                native_language=self.source_combo.currentText(),  # Native = source language
+                target_language=self.target_combo.currentText(),  # Target = learning language
+                audio_fetcher=session.audio_fetcher(),
+            )
+            self.add_note(
                 word_data,
                 deck_name,
-                mnemonic,
-                synonym,
-                antonym,
-                mw.pm.night_mode(),
+                deck_id,
+                mnemonic_data,
+                (self.source_combo.currentText(), self.target_combo.currentText()),
             )
 
-            note_obj = mw.col.new_note(mw.col.models.by_name("Basic"))
-            note_obj["Front"] = note["fields"]["Front"]
-            note_obj["Back"] = note["fields"]["Back"]
-            mw.col.add_note(note_obj, deck_id)
-
             self.word_input.clear()
+            self.update_usage_label()
             showInfo(f"Card for '{word}' created successfully!")
             mw.reset()
 
@@ -402,9 +442,374 @@ class CambridgeDictionaryDialog(QDialog):
             showInfo(f"Error creating card: {str(e)}")
 
 
+    def generate_mnemonic(self, word, word_data, native_language, target_language):
+        """Mnemonic for the first sense that has a definition, plus under
+        "senses" one per entry (None where no mnemonic was generated) when
+        per-sense mnemonics are enabled"""
+        positions = [i for i, entry in enumerate(word_data.entries) if entry.definition]
+        if not positions:
+            return {"mnemonic": "", "synonym": "", "antonym": ""}
+        if not config.get("per_sense_mnemonics", True):
+            positions = positions[:1]
+        else:
+            positions = positions[: max(1, config.get("max_sense_mnemonics", 6))]
+
+        # Inflected inputs share the headword's cached mnemonics
+        senses = self.mnemonic_generator.create_sense_mnemonics(
+            word_data.headword or word,
+            [word_data.entries[i].definition for i in positions],
+            native_language=native_language,
+            target_language=target_language,
+        )
+        result = dict(senses[0])
+        result["usage"] = {
+            key: sum(sense.get("usage", {}).get(key, 0) for sense in senses)
+            for key in ("prompt_tokens", "completion_tokens")
+        }
+        if len(senses) > 1:
+            # Aligned with word_data.entries, so each lands in its own box
+            aligned = [None] * len(word_data.entries)
+            for position, sense in zip(positions, senses):
+                aligned[position] = {key: sense[key] for key in ("mnemonic", "synonym", "antonym")}
+            result["senses"] = aligned
+        return result
+
+    def generate_card_content(
+        self, word, word_data, native_language, target_language, audio_fetcher=None
+    ):
+        """Generate the mnemonic while the pronunciation audio downloads"""
+        audio_futures = {}
+        if audio_fetcher is not None and word_data.audio:
+            audio_futures = audio_fetcher.fetch_async(url for _, url in word_data.audio)
+
+        content = dict(self.generate_mnemonic(word, word_data, native_language, target_language))
+        content["audio_files"] = wait_for_audio(audio_futures)
+        return content
+
+    def add_note(self, word_data, deck_name, deck_id, mnemonic_data, languages):
+        # Downloads are staged off the main thread; the collection's media
+        # manager has to add them so the media database registers the files
+        audio_files = mnemonic_data.get("audio_files") or []
+        audio_fetcher = session.audio_fetcher()
+        if audio_files and audio_fetcher is not None:
+            audio_files = audio_fetcher.store(mw.col.media, audio_files)
+        else:
+            audio_files = []
+
+        note = create_anki_note(
+            word_data,
+            deck_name,
+            mnemonic_data["mnemonic"],
+            mnemonic_data["synonym"],
+            mnemonic_data["antonym"],
+            mw.pm.night_mode(),
+            audio_files,
+            languages,
+            mnemonic_data.get("senses"),
+        )
+
+        note_obj = mw.col.new_note(mw.col.models.by_name("Basic"))
+        note_obj["Front"] = note["fields"]["Front"]
+        note_obj["Back"] = note["fields"]["Back"]
+        note_obj.tags = note["tags"]
+        mw.col.add_note(note_obj, deck_id)
+
+        generator = self.mnemonic_generator
+        session.usage_log().record(
+            note_obj.id,
+            word_data.word,
+            generator.provider if generator else "",
+            generator.model if generator else "",
+            mnemonic_data.get("usage"),
+        )
+        return note_obj.id
+
+    def update_usage_label(self):
+        """Show today's card count and average token cost per card"""
+        midnight = datetime.datetime.combine(datetime.date.today(), datetime.time()).timestamp()
+        totals = session.usage_log().totals(since=midnight)
+        self.usage_label.setText(
+            f"Today: {totals['cards']} cards, "
+            f"{totals['prompt_tokens'] + totals['completion_tokens']} tokens "
+            f"({totals['tokens_per_card']:.0f} per card)"
+        )
+
+    def import_word_list(self):
+        """Create cards for a whole word list as a resumable background job"""
+        if not self.validate_api_keys():
+            return
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Import Word List")
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("One word per line:"))
+        words_edit = QTextEdit()
+        layout.addWidget(words_edit)
+
+        button_layout = QHBoxLayout()
+        start_btn = QPushButton("Start")
+        cancel_btn = QPushButton("Cancel")
+        button_layout.addWidget(start_btn)
+        button_layout.addWidget(cancel_btn)
+        layout.addLayout(button_layout)
+        dialog.setLayout(layout)
+
+        start_btn.clicked.connect(dialog.accept)
+        cancel_btn.clicked.connect(dialog.reject)
+
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+
+        words = [w.strip() for w in words_edit.toPlainText().splitlines() if w.strip()]
+        if not words:
+            return
+
+        job_id = session.job_queue().create_job(
+            [{"word": word, "dict_url": self.get_dict_url(word)} for word in words],
+            {
+                "deck_name": self.deck_combo.currentText(),
+                "native_language": self.source_combo.currentText(),
+                "target_language": self.target_combo.currentText(),
+            },
+        )
+        self.run_job(job_id)
+
+    def export_word_pack(self):
+        """Write the cached pages and mnemonics of the selected dictionary to a pack file"""
+        dictionary = self.dictionary_name()
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Word Pack",
+            f"{dictionary}{PACK_EXTENSION}",
+            f"Word packs (*{PACK_EXTENSION})",
+        )
+        if not path:
+            return
+        if not path.endswith(PACK_EXTENSION):
+            path += PACK_EXTENSION
+
+        languages = (self.source_combo.currentText(), self.target_combo.currentText())
+        # Only the local cache is exported; imported packs are already shareable
+        primary = session.word_cache().primary
+
+        def on_done(future):
+            mw.progress.finish()
+            try:
+                counts = future.result()
+            except Exception as e:
+                showInfo(f"Could not export the word pack: {e}")
+                return
+            showInfo(
+                f"Exported {counts['pages']} pages and {counts['mnemonics']} mnemonics "
+                f"to {os.path.basename(path)}."
+            )
+
+        mw.progress.start(label="Exporting word pack...", parent=self)
+        mw.taskman.run_in_background(
+            lambda: export_pack(primary, path, dictionary, languages), on_done
+        )
+
+    def import_word_pack(self):
+        """Copy a pack into the add-on folder and start serving lookups from it"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Word Pack", "", f"Word packs (*{PACK_EXTENSION})"
+        )
+        if not path:
+            return
+
+        destination = os.path.join(packs_dir(), os.path.basename(path))
+        if os.path.exists(destination):
+            showInfo(f"A word pack named {os.path.basename(path)} is already installed.")
+            return
+        try:
+            pack = WordPack(path)
+            pack.close()
+            shutil.copyfile(path, destination)
+            pack = WordPack(destination)
+        except (OSError, ValueError) as e:
+            showInfo(f"Could not import the word pack: {e}")
+            return
+
+        session.word_cache().add_tier(pack)
+        counts = pack.meta.get("counts", {})
+        showInfo(
+            f"Imported {pack.meta.get('name', os.path.basename(path))}: "
+            f"{counts.get('pages', 0)} pages and {counts.get('mnemonics', 0)} mnemonics."
+        )
+
+    def offer_resume_jobs(self):
+        job_ids = session.job_queue().unfinished_jobs()
+        if not job_ids:
+            return
+
+        stats = session.job_queue().stats(job_ids[0])
+        done = stats["counts"]["inserted"]
+        msg = QMessageBox(self)
+        msg.setIcon(QMessageBox.Icon.Question)
+        msg.setText(f"A word list import stopped after {done} of {stats['total']} words.")
+        msg.setInformativeText(
+            "Would you like to resume it? Discard drops the words not imported yet."
+        )
+        msg.setStandardButtons(
+            QMessageBox.StandardButton.Yes |
+            QMessageBox.StandardButton.No |
+            QMessageBox.StandardButton.Discard
+        )
+        answer = msg.exec()
+        if answer == QMessageBox.StandardButton.Discard:
+            session.job_queue().discard_job(job_ids[0])
+        elif answer == QMessageBox.StandardButton.Yes and self.validate_api_keys():
+            self.run_job(job_ids[0])
+
+    def run_job(self, job_id):
+        """Process a job batch by batch: fetch and generate in the background,
+        insert notes on the main thread after each batch."""
+        queue = session.job_queue()
+        generator = self.mnemonic_generator
+        audio_fetcher = session.audio_fetcher()
+        params = queue.job(job_id)["params"]
+        deck_name = params["deck_name"]
+        if mw.col.decks.id_for_name(deck_name) is None:
+            session.invalidate_decks()
+        deck_id = mw.col.decks.id(deck_name, create=True)
+        languages = (params["native_language"], params["target_language"])
+
+        def generate(word, word_data):
+            return self.generate_card_content(
+                word,
+                word_data,
+                native_language=params["native_language"],
+                target_language=params["target_language"],
+                audio_fetcher=audio_fetcher,
+            )
+
+        def insert_generated():
+            for item in queue.items(job_id, (GENERATED,)):
+                try:
+                    note_id = self.add_note(
+                        item["word_data"], deck_name, deck_id, item["mnemonic"], languages
+                    )
+                    queue.mark_inserted(item["id"], note_id)
+                except Exception as e:
+                    queue.mark_failed(item["id"], str(e))
+
+        def next_batch():
+            mw.taskman.run_in_background(
+                lambda: process_batch(
+                    queue,
+                    job_id,
+                    session.lookup_word,
+                    generate,
+                    batch_size=generator.batch_size,
+                    concurrency=generator.max_concurrency,
+                    prefetch=session.word_cache().prefetch_pages,
+                ),
+                on_batch_done,
+            )
+
+        def on_batch_done(future):
+            try:
+                processed = future.result()
+            except Exception as e:
+                mw.progress.finish()
+                showInfo(f"Error importing word list: {str(e)}")
+                return
+
+            insert_generated()
+            stats = queue.stats(job_id)
+            mw.progress.update(
+                label=self.job_progress_label(stats),
+                value=stats["counts"]["inserted"] + stats["counts"]["failed"],
+                max=stats["total"],
+            )
+            if processed and not mw.progress.want_cancel():
+                next_batch()
+            else:
+                finish(stats)
+
+        def finish(stats):
+            mw.progress.finish()
+            mw.reset()
+            self.update_usage_label()
+            failed = stats["counts"][FAILED]
+            if not failed:
+                showInfo(f"Imported {stats['counts']['inserted']} of {stats['total']} words.")
+                return
+
+            msg = QMessageBox(self)
+            msg.setIcon(QMessageBox.Icon.Question)
+            msg.setText(
+                f"Imported {stats['counts']['inserted']} of {stats['total']} words, "
+                f"{failed} failed."
+            )
+            msg.setInformativeText("Would you like to retry the failed words?")
+            msg.setStandardButtons(
+                QMessageBox.StandardButton.Yes |
+                QMessageBox.StandardButton.No
+            )
+            if msg.exec() == QMessageBox.StandardButton.Yes:
+                queue.retry_failed(job_id)
+                self.run_job(job_id)
+
+        queue.mark_started(job_id)
+        mw.progress.start(label="Importing word list...", immediate=True)
+        insert_generated()  # Finish items generated before an interruption
+        next_batch()
+
+    @staticmethod
+    def job_progress_label(stats):
+        label = (
+            f"Imported {stats['counts']['inserted']} of {stats['total']} words"
+            f" ({stats['throughput']:.1f} words/min)"
+        )
+        if stats["eta"] is not None:
+            minutes, seconds = divmod(int(stats["eta"]), 60)
+            label += f", about {minutes}m {seconds:02d}s left"
+        return label
+
+
+enrichment_scheduler = EnrichmentScheduler(
+    config,
+    session.default_generator,
+    DailyBudget(
+        user_files_path("enrich_budget.json"),
+        max_requests=config.get("enrich_daily_requests", 50),
+        max_tokens=config.get("enrich_daily_tokens", 20000),
+    ),
+    session.usage_log,
+)
+gui_hooks.profile_did_open.append(enrichment_scheduler.start)
+gui_hooks.profile_will_close.append(enrichment_scheduler.stop)
+
+
+gui_hooks.profile_did_open.append(session.warm_up)
+gui_hooks.operation_did_execute.append(session.on_operation_did_execute)
+gui_hooks.sync_did_finish.append(session.invalidate_decks)
+gui_hooks.collection_did_load.append(session.invalidate_decks)
+
+# Built on first open and reused until the profile closes
+_dialog = None
+
+
+def close_dialog():
+    global _dialog
+    if _dialog is not None:
+        _dialog.deleteLater()
+        _dialog = None
+    session.on_profile_close()
+
+
+gui_hooks.profile_will_close.append(close_dialog)
+
+
 def show_dialog():
-    dialog = CambridgeDictionaryDialog(mw)
-    dialog.exec()
+    global _dialog
+    if _dialog is None:
+        _dialog = CambridgeDictionaryDialog(mw)
+    else:
+        _dialog.refresh()
+    _dialog.offer_resume_jobs()
+    _dialog.exec()
 
 
 action = QAction("MnemoMaker", mw)
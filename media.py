@@ -0,0 +1,145 @@
+"""Pronunciation audio download for the collection media folder.
+
+Downloads run in the background and are staged in the add-on's user files,
+named after a hash of their content, so a recording shared by several words
+(or downloaded twice) is fetched and stored once. A small SQLite index
+remembers which file each URL produced; URLs whose file is already in the
+media folder (or still staged) are resolved without any network request.
+Staged files are moved into the collection with ``store`` on the main
+thread, through Anki's media manager, so the media database knows about
+them and they sync.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .singleflight import SingleFlight
+
+AUDIO_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Referer": "https://dictionary.cambridge.org/",
+}
+
+
+def wait_for_audio(futures: Dict[str, "Future[Optional[str]]"]) -> List[str]:
+    """Filenames of the downloads started by ``fetch_async`` that succeeded"""
+    filenames = []
+    for url, future in futures.items():
+        try:
+            filename = future.result()
+        except Exception as e:
+            print(f"MnemoMaker: could not download audio {url}: {e}")
+            continue
+        if filename:
+            filenames.append(filename)
+    return filenames
+
+
+class AudioFetcher:
+    def __init__(self, staging_dir: str, index_path: str, max_workers: int = 4):
+        self.staging_dir = staging_dir
+        # Media folder of the open collection, checked before downloading
+        self.media_dir: Optional[str] = None
+        os.makedirs(staging_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._flights = SingleFlight()
+
+        # One pooled session keeps connections to the audio host alive
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(AUDIO_HEADERS)
+
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(index_path, check_same_thread=False)
+        with self._lock, self._index:
+            self._index.execute(
+                "CREATE TABLE IF NOT EXISTS audio (url TEXT PRIMARY KEY, filename TEXT NOT NULL)"
+            )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._session.close()
+        with self._lock:
+            self._index.close()
+
+    def fetch_async(self, urls: Iterable[str]) -> Dict[str, "Future[Optional[str]]"]:
+        """Start downloading ``urls`` in the background; returns a future per
+        URL resolving to its staged filename (see ``wait_for_audio``)"""
+        return {url: self._executor.submit(self.fetch_one, url) for url in urls}
+
+    def fetch_one(self, url: str) -> Optional[str]:
+        """Filename for ``url``, downloading it only if it is neither in the
+        media folder nor staged yet"""
+        filename = self._lookup(url)
+        if filename and any(
+            directory and os.path.exists(os.path.join(directory, filename))
+            for directory in (self.media_dir, self.staging_dir)
+        ):
+            return filename
+        return self._flights.do(url, self._download, url)
+
+    def store(self, media, filenames: Iterable[str]) -> List[str]:
+        """Move staged files into the collection through its media manager
+        (``mw.col.media``) and return the names they are stored under.
+
+        Must be called on the main thread.
+        """
+        stored = []
+        for filename in filenames:
+            path = os.path.join(self.staging_dir, filename)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                # Already moved for another word sharing the recording
+                if media.have(filename):
+                    stored.append(filename)
+                else:
+                    print(f"MnemoMaker: audio file {filename} is missing")
+                continue
+            name = media.write_data(filename, data)
+            if name != filename:
+                with self._lock, self._index:
+                    self._index.execute(
+                        "UPDATE audio SET filename = ? WHERE filename = ?", (name, filename)
+                    )
+            os.remove(path)
+            stored.append(name)
+        return stored
+
+    def _lookup(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._index.execute(
+                "SELECT filename FROM audio WHERE url = ?", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _download(self, url: str) -> Optional[str]:
+        response = self._session.get(url, timeout=15)
+        response.raise_for_status()
+        data = response.content
+        if not data:
+            return None
+
+        extension = os.path.splitext(url.split("?", 1)[0])[1] or ".mp3"
+        filename = f"mnemomaker_{hashlib.sha1(data).hexdigest()[:24]}{extension}"
+        path = os.path.join(self.staging_dir, filename)
+        in_media = self.media_dir and os.path.exists(os.path.join(self.media_dir, filename))
+        if not in_media and not os.path.exists(path):
+            temp_path = f"{path}.part"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+        with self._lock, self._index:
+            self._index.execute(
+                "INSERT OR REPLACE INTO audio (url, filename) VALUES (?, ?)", (url, filename)
+            )
+        return filename
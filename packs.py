@@ -0,0 +1,236 @@
+"""Prebuilt word packs: dictionary pages and mnemonics in one indexed file.
+
+A pack holds the ``get_word_data`` results and ``create_mnemonic`` outputs
+for one language pair, so a whole word list can be turned into cards
+without any network I/O. The file is memory-mapped and looked up in place
+through a sorted hash index; nothing is loaded into RAM up front and
+importing a pack is a file copy.
+
+Layout (little-endian)::
+
+    header   magic "MNPK", version u16, flags u16, count u32,
+             meta offset u64, index offset u64, padded to 32 bytes
+    records  key length u16, key (utf-8), value
+    meta     JSON object (language pair, creation time, counts)
+    index    count x (key hash u64, record offset u64, record length u32),
+             sorted by hash
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+from .cache import slugify
+from .camanki import mnemonic_cache_key
+from .records import WordData
+
+MAGIC = b"MNPK"
+PACK_VERSION = 1
+PACK_EXTENSION = ".mnpk"
+
+_HEADER = struct.Struct("<4sHHIQQ")
+_HEADER_SIZE = 32
+_INDEX_ENTRY = struct.Struct("<QQI")
+_KEY_LENGTH = struct.Struct("<H")
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _page_key(dict_url: str) -> bytes:
+    return f"p:{dict_url}".encode("utf-8")
+
+
+def _mnemonic_key(key: str) -> bytes:
+    return f"m:{key}".encode("utf-8")
+
+
+def _lemma_key(dictionary: str, form: str) -> bytes:
+    return f"l:{dictionary}/{slugify(form)}".encode("utf-8")
+
+
+class PackWriter:
+    """Stream records into a new pack file; the index is written on close"""
+
+    def __init__(self, path: str, meta: Dict):
+        self.path = path
+        self.meta = dict(meta)
+        self._temp_path = f"{path}.part"
+        self._file = open(self._temp_path, "wb")
+        self._file.write(b"\0" * _HEADER_SIZE)
+        self._index = []
+        self._keys = set()
+        self.counts = {"pages": 0, "mnemonics": 0, "lemmas": 0}
+
+    def _add(self, key: bytes, value: bytes) -> bool:
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        offset = self._file.tell()
+        record = _KEY_LENGTH.pack(len(key)) + key + value
+        self._file.write(record)
+        self._index.append((_hash(key), offset, len(record)))
+        return True
+
+    def add_page(self, dict_url: str, word_data: WordData):
+        if self._add(_page_key(dict_url), word_data.to_bytes()):
+            self.counts["pages"] += 1
+
+    def add_mnemonic(self, key: str, mnemonic_data: Dict):
+        data = {k: v for k, v in mnemonic_data.items() if k != "usage"}
+        value = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        if self._add(_mnemonic_key(key), value):
+            self.counts["mnemonics"] += 1
+
+    def add_lemma(self, dictionary: str, form: str, headword: str):
+        if self._add(_lemma_key(dictionary, form), headword.encode("utf-8")):
+            self.counts["lemmas"] += 1
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._temp_path)
+
+    def close(self):
+        meta = dict(self.meta, counts=self.counts, created_at=time.time())
+        meta_offset = self._file.tell()
+        self._file.write(json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+        index_offset = self._file.tell()
+        self._index.sort()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+
+        self._file.seek(0)
+        self._file.write(
+            _HEADER.pack(MAGIC, PACK_VERSION, 0, len(self._index), meta_offset, index_offset)
+        )
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+
+class WordPack:
+    """Read-only, memory-mapped pack with the lookup methods of ``WordCache``"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            # mmap refuses empty files with an error of its own
+            if os.fstat(f.fileno()).st_size < _HEADER_SIZE:
+                raise ValueError(f"{os.path.basename(path)} is not a word pack")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._open(os.path.basename(path))
+        except ValueError:
+            self._map.close()
+            raise
+
+    def _open(self, name: str):
+        """Read and validate the header, so a truncated or foreign file fails
+        here with ValueError rather than on a later lookup"""
+        size = len(self._map)
+        if size < _HEADER_SIZE or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{name} is not a word pack")
+        _, version, _, self._count, meta_offset, self._index_offset = _HEADER.unpack_from(
+            self._map, 0
+        )
+        if version > PACK_VERSION:
+            raise ValueError(f"{name} needs a newer version of MnemoMaker")
+        if not (
+            _HEADER_SIZE <= meta_offset <= self._index_offset
+            and self._index_offset + self._count * _INDEX_ENTRY.size == size
+        ):
+            raise ValueError(f"{name} is truncated or damaged")
+        try:
+            self.meta = json.loads(self._map[meta_offset:self._index_offset].decode("utf-8"))
+        except ValueError:
+            raise ValueError(f"{name} is truncated or damaged") from None
+
+    def close(self):
+        self._map.close()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        target = _hash(key)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry_hash = _INDEX_ENTRY.unpack_from(
+                self._map, self._index_offset + middle * _INDEX_ENTRY.size
+            )[0]
+            if entry_hash < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        # Walk the (rare) run of entries sharing this hash
+        position = low
+        while position < self._count:
+            entry_hash, offset, length = _INDEX_ENTRY.unpack_from(
+                self._map, self._index_offset + position * _INDEX_ENTRY.size
+            )
+            if entry_hash != target:
+                break
+            if offset + length > self._index_offset:
+                return None  # damaged entry pointing past the records
+            key_length = _KEY_LENGTH.unpack_from(self._map, offset)[0]
+            start = offset + _KEY_LENGTH.size
+            if self._map[start:start + key_length] == key:
+                return self._map[start + key_length:offset + length]
+            position += 1
+        return None
+
+    def get_page(self, dict_url: str) -> Optional[WordData]:
+        value = self._get(_page_key(dict_url))
+        return WordData.from_bytes(value) if value is not None else None
+
+    def get_mnemonic(self, key: str) -> Optional[Dict]:
+        value = self._get(_mnemonic_key(key))
+        return json.loads(zlib.decompress(value).decode("utf-8")) if value is not None else None
+
+    def lookup_lemma(self, dictionary: str, form: str) -> Optional[str]:
+        value = self._get(_lemma_key(dictionary, form))
+        return value.decode("utf-8") if value is not None else None
+
+
+def export_pack(
+    cache,
+    path: str,
+    dictionary: str,
+    languages: Tuple[str, str],
+    name: Optional[str] = None,
+) -> Dict:
+    """Write every cached page of ``dictionary`` (e.g. ``"english-turkish"``),
+    the mnemonics cached for its senses in ``languages`` (native, target) and
+    its lemma index to a pack. Returns the record counts."""
+    native_language, target_language = languages
+    writer = PackWriter(
+        path,
+        {
+            "name": name or dictionary,
+            "dictionary": dictionary,
+            "native_language": native_language,
+            "target_language": target_language,
+        },
+    )
+    try:
+        for dict_url, word_data in cache.iter_pages(dictionary):
+            writer.add_page(dict_url, word_data)
+            words = {word_data.word, word_data.headword or word_data.word}
+            for entry in word_data.entries:
+                for word in words:
+                    key = mnemonic_cache_key(word, entry.definition, native_language, target_language)
+                    mnemonic_data = cache.get_mnemonic(key)
+                    if mnemonic_data is not None:
+                        writer.add_mnemonic(key, mnemonic_data)
+        for form, headword in cache.iter_lemmas(dictionary):
+            writer.add_lemma(dictionary, form, headword)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.counts
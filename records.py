@@ -0,0 +1,210 @@
+"""Compact record types for Cambridge word data."""
+import json
+import zlib
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Bump whenever the serialized layout changes; ``loads`` keeps reading
+# every older version it knows about.
+RECORD_VERSION = 4
+
+
+class Entry:
+    """One sense of a word: definition, translation and its examples."""
+
+    __slots__ = ("definition", "translation", "examples")
+
+    def __init__(
+        self,
+        definition: Optional[str] = None,
+        translation: Optional[str] = None,
+        examples: Iterable[str] = (),
+    ):
+        self.definition = definition
+        self.translation = translation
+        self.examples = tuple(examples)
+
+    # Mapping-style access so code written against the old dicts keeps working
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return self._pack() == other._pack()
+
+    def __repr__(self) -> str:
+        return f"Entry(definition={self.definition!r}, translation={self.translation!r})"
+
+    def _pack(self) -> list:
+        return [self.definition, self.translation, list(self.examples)]
+
+    @classmethod
+    def _unpack(cls, data: list) -> "Entry":
+        return cls(data[0], data[1], data[2])
+
+    def to_dict(self) -> Dict:
+        return {
+            "definition": self.definition,
+            "translation": self.translation,
+            "examples": list(self.examples),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Entry":
+        return cls(
+            data.get("definition"),
+            data.get("translation"),
+            data.get("examples") or (),
+        )
+
+
+class WordData:
+    """Structured dictionary data for a single word."""
+
+    __slots__ = (
+        "word",
+        "structure",
+        "entries",
+        "pronunciation",
+        "other_examples",
+        "audio",
+        "headword",
+        "forms",
+    )
+
+    def __init__(
+        self,
+        word: str,
+        structure: Iterable[str] = (),
+        entries: Iterable[Entry] = (),
+        pronunciation: Optional[str] = None,
+        other_examples: Iterable[str] = (),
+        audio: Iterable[Tuple[str, str]] = (),
+        headword: Optional[str] = None,
+        forms: Iterable[str] = (),
+    ):
+        self.word = word
+        self.structure = tuple(structure)
+        self.entries = tuple(entries)
+        self.pronunciation = pronunciation
+        self.other_examples = tuple(other_examples)
+        # (region, url) pairs of pronunciation recordings, e.g. ("uk", "https://...mp3")
+        self.audio = tuple((region, url) for region, url in audio)
+        # Dictionary headword of the page and the irregular inflections it lists
+        self.headword = headword
+        self.forms = tuple(forms)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, WordData):
+            return NotImplemented
+        return self._pack() == other._pack()
+
+    def __repr__(self) -> str:
+        return f"WordData(word={self.word!r}, entries={len(self.entries)})"
+
+    def replace(self, **changes) -> "WordData":
+        """Copy of the record with some fields changed"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return WordData(**fields)
+
+    def _pack(self) -> list:
+        return [
+            RECORD_VERSION,
+            self.word,
+            list(self.structure),
+            self.pronunciation,
+            [entry._pack() for entry in self.entries],
+            list(self.other_examples),
+            [list(pair) for pair in self.audio],
+            self.headword,
+            list(self.forms),
+        ]
+
+    def dumps(self) -> str:
+        """Serialize to a compact, versioned JSON array"""
+        return json.dumps(self._pack(), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, text: str) -> "WordData":
+        data = json.loads(text)
+        if not isinstance(data, list) or not data or data[0] not in range(1, RECORD_VERSION + 1):
+            raise ValueError(f"Unsupported word data record: {str(data)[:40]}")
+        return cls(
+            word=data[1],
+            structure=data[2],
+            pronunciation=data[3],
+            entries=[Entry._unpack(e) for e in data[4]],
+            other_examples=data[5],
+            # Version 1 records predate audio capture, version 2 the lemma
+            # fields; version 3 forms mixed in run-ons, which are words of
+            # their own, so they are dropped
+            audio=data[6] if data[0] >= 2 else (),
+            headword=data[7] if data[0] >= 3 else None,
+            forms=data[8] if data[0] >= 4 else (),
+        )
+
+    def to_bytes(self) -> bytes:
+        """Serialize to zlib-compressed bytes for storage or transfer"""
+        return zlib.compress(self.dumps().encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "WordData":
+        return cls.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def to_dict(self) -> Dict:
+        result = {
+            "word": self.word,
+            "structure": list(self.structure),
+            "entries": [entry.to_dict() for entry in self.entries],
+            "pronunciation": self.pronunciation,
+        }
+        if self.other_examples:
+            result["other_examples"] = list(self.other_examples)
+        if self.audio:
+            result["audio"] = [list(pair) for pair in self.audio]
+        if self.headword:
+            result["headword"] = self.headword
+        if self.forms:
+            result["forms"] = list(self.forms)
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "WordData":
+        return cls(
+            word=data["word"],
+            structure=data.get("structure") or (),
+            entries=[
+                e if isinstance(e, Entry) else Entry.from_dict(e)
+                for e in data.get("entries") or ()
+            ],
+            pronunciation=data.get("pronunciation"),
+            other_examples=data.get("other_examples") or (),
+            audio=data.get("audio") or (),
+            headword=data.get("headword"),
+            forms=data.get("forms") or (),
+        )
+
+    @classmethod
+    def coerce(cls, data) -> "WordData":
+        """Accept either a ``WordData`` or a legacy word data dict"""
+        if isinstance(data, cls):
+            return data
+        return cls.from_dict(data)
@@ -0,0 +1,246 @@
+"""Retry, deadline and circuit breaker handling for LLM provider calls."""
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit is open and calls are skipped"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when retries would run past the request deadline"""
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse header durations such as ``"7"``, ``"1.5s"``, ``"2m59.56s"`` or ``"250ms"``"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds the provider asked us to wait, if it said so"""
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        seconds = parse_duration(value)
+        if seconds is not None:
+            return seconds
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    # Groq and OpenAI report when an exhausted rate limit window resets
+    waits = []
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if reset and remaining is not None and remaining.strip() == "0":
+            seconds = parse_duration(reset)
+            if seconds is not None:
+                waits.append(seconds)
+    return max(waits) if waits else None
+
+
+def _status_and_headers(exc: Exception) -> Tuple[Optional[int], Dict]:
+    """Pull the HTTP status and headers out of requests or SDK exceptions"""
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    return status, headers
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status, _ = _status_and_headers(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # SDK clients used through LangChain raise their own connection errors
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def is_provider_failure(exc: Exception) -> bool:
+    """Whether a retryable error means the provider is unhealthy: a 5xx, a
+    timeout or a connection error. A 429 only asks us to slow down."""
+    status, _ = _status_and_headers(exc)
+    if status is not None:
+        return status == 408 or status >= 500
+    return is_retryable(exc)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one trial call through"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started = now
+                return True
+            if self.state == self.HALF_OPEN:
+                # Only the probe goes through; a probe that never reported
+                # back is replaced after another reset_timeout
+                if now - self._probe_started < self.reset_timeout:
+                    return False
+                self._probe_started = now
+                return True
+            return True
+
+    def retry_in(self) -> float:
+        """Seconds until ``allow`` may let a call through again"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                return max(0.0, self._opened_at + self.reset_timeout - now)
+            if self.state == self.HALF_OPEN:
+                return max(0.0, self._probe_started + self.reset_timeout - now)
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(provider: str, model: str) -> CircuitBreaker:
+    """Shared circuit breaker for a provider/model pair"""
+    with _breakers_lock:
+        key = (provider, model)
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker()
+        return _breakers[key]
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 20.0,
+        request_timeout: float = 30.0,
+        deadline: float = 60.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_timeout = request_timeout
+        self.deadline = deadline
+
+    def backoff(self, attempt: int, exc: Exception) -> float:
+        _, headers = _status_and_headers(exc)
+        hinted = retry_after(headers)
+        if hinted is not None:
+            return hinted + random.uniform(0, self.base_delay)
+        # Full jitter keeps concurrent batch workers from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(
+        self,
+        fn: Callable[[float], object],
+        breaker: Optional[CircuitBreaker] = None,
+        wait_for_breaker: bool = False,
+    ):
+        """Call ``fn(timeout)`` until it succeeds, fails permanently or runs out of time.
+
+        With ``wait_for_breaker`` an open breaker is waited out while the
+        deadline allows, for callers that have no other provider to fail over to.
+        """
+        start = time.monotonic()
+        for attempt in range(self.max_attempts):
+            if breaker:
+                self._wait_for(breaker, start, wait_for_breaker)
+
+            remaining = self.deadline - (time.monotonic() - start)
+            try:
+                result = fn(min(self.request_timeout, remaining))
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered, so it is reachable; this also
+                    # settles a half-open probe
+                    if breaker:
+                        breaker.record_success()
+                    raise
+                if breaker:
+                    if is_provider_failure(e):
+                        breaker.record_failure()
+                    else:
+                        # Rate limited: healthy, we just wait as long as it asks
+                        breaker.record_success()
+                if attempt == self.max_attempts - 1:
+                    raise
+
+                delay = self.backoff(attempt, e)
+                if time.monotonic() - start + delay >= self.deadline:
+                    raise DeadlineExceededError(
+                        f"Gave up after {attempt + 1} attempts: {str(e)}"
+                    ) from e
+                time.sleep(delay)
+            else:
+                if breaker:
+                    breaker.record_success()
+                return result
+
+    def _wait_for(self, breaker: CircuitBreaker, start: float, wait: bool):
+        while not breaker.allow():
+            delay = breaker.retry_in()
+            if not wait or time.monotonic() - start + delay >= self.deadline:
+                raise CircuitOpenError("Provider is temporarily unavailable after repeated failures")
+            # A half-open probe can settle well before its timeout
+            time.sleep(min(max(delay, 0.01), self.base_delay))
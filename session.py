@@ -0,0 +1,240 @@
+"""Long-lived add-on state shared by the dialog, list imports and enrichment."""
+import glob
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from aqt import mw
+
+from .cache import RemoteCache, TieredCache, WordCache
+from .camanki import MnemonicGenerator, get_word_data, user_files_path
+from .jobs import JobQueue
+from .media import AudioFetcher
+from .packs import PACK_EXTENSION, WordPack
+from .resilience import RetryPolicy
+from .usage import UsageLog
+
+
+def packs_dir() -> str:
+    path = user_files_path("packs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class MnemoSession:
+    def __init__(self, config: Dict):
+        self.config = config
+        # Reentrant: building a generator opens the word cache
+        self._lock = threading.RLock()
+        self._job_queue = None
+        self._usage_log = None
+        self._word_cache = None
+        self._audio_fetcher = None
+        self._generators: Dict[Tuple[str, str, bool], MnemonicGenerator] = {}
+        # Sorted (name, id) pairs of the open profile's decks
+        self._decks: List[Tuple[str, int]] = []
+        self._decks_stale = True
+        # Bumped whenever the deck index changes, so views know to refresh
+        self.decks_version = 0
+
+    # Persistent stores
+
+    def job_queue(self) -> JobQueue:
+        """Persistent queue for list imports"""
+        with self._lock:
+            if self._job_queue is None:
+                self._job_queue = JobQueue(user_files_path("jobs.sqlite"))
+            return self._job_queue
+
+    def usage_log(self) -> UsageLog:
+        """Token usage of every created card"""
+        with self._lock:
+            if self._usage_log is None:
+                self._usage_log = UsageLog(user_files_path("usage.sqlite"))
+            return self._usage_log
+
+    def word_cache(self) -> TieredCache:
+        """Cached pages, mnemonics and the lemma index, shared by all
+        profiles, backed by imported word packs and the shared cache server"""
+        with self._lock:
+            if self._word_cache is None:
+                self._word_cache = self._open_word_cache()
+            return self._word_cache
+
+    def _open_word_cache(self) -> TieredCache:
+        cache = TieredCache(WordCache(user_files_path("cache.sqlite")))
+        for path in sorted(glob.glob(os.path.join(packs_dir(), f"*{PACK_EXTENSION}"))):
+            try:
+                cache.add_tier(WordPack(path))
+            except (OSError, ValueError) as e:
+                print(f"MnemoMaker: skipping word pack {path}: {e}")
+        # A shared cache server goes last: local tiers answer without a round-trip
+        if self.config.get("cache_server_url"):
+            cache.add_tier(
+                RemoteCache(
+                    self.config["cache_server_url"],
+                    token=self.config.get("cache_server_token", ""),
+                    timeout=self.config.get("cache_server_timeout", 5),
+                    wait=self.config.get("cache_server_wait", 20),
+                )
+            )
+        return cache
+
+    def lookup_word(self, word: str, dict_url: str):
+        return get_word_data(word, dict_url, cache=self.word_cache())
+
+    def audio_fetcher(self) -> Optional[AudioFetcher]:
+        """Pronunciation downloader; its files are added to a collection with
+        ``AudioFetcher.store`` when the note is.
+
+        Must be called on the main thread, as it reads the media folder from
+        the collection.
+        """
+        if not self.config.get("download_audio", True):
+            return None
+        media_dir = mw.col.media.dir()
+        with self._lock:
+            if self._audio_fetcher is None:
+                self._audio_fetcher = AudioFetcher(
+                    user_files_path("audio"), user_files_path("audio_index.sqlite")
+                )
+            self._audio_fetcher.media_dir = media_dir
+            return self._audio_fetcher
+
+    # LLM generators
+
+    def has_api_key(self, provider: str) -> bool:
+        api_key = self.config.get(f"{provider}_api_key", "")
+        # Local servers don't need an API key
+        return provider == "local" or bool(api_key and not api_key.startswith("your-"))
+
+    def retry_policy(self, provider: str) -> RetryPolicy:
+        # CPU inference on a local server can take much longer than a cloud API
+        request_timeout = self.config.get(
+            f"{provider}_request_timeout", self.config.get("llm_request_timeout", 30)
+        )
+        return RetryPolicy(
+            max_attempts=self.config.get("llm_max_attempts", 4),
+            request_timeout=request_timeout,
+            deadline=max(self.config.get("llm_deadline", 60), request_timeout),
+        )
+
+    def provider_settings(self, provider: str) -> Dict:
+        return {
+            "base_url": self.config.get(f"{provider}_base_url") or None,
+            "max_concurrency": self.config.get(f"{provider}_concurrency", 4),
+            "batch_size": self.config.get(f"{provider}_batch_size", 10),
+        }
+
+    def generation_settings(self) -> Dict:
+        return {
+            "prompt_profile": self.config.get("prompt_profile", "compact"),
+            "max_tokens": self.config.get("llm_max_tokens"),
+            "temperature": self.config.get("llm_temperature", 0.7),
+            "stop": self.config.get("llm_stop_sequences"),
+        }
+
+    def generator(self, provider: str, model: str, with_fallback: bool = True) -> MnemonicGenerator:
+        """MnemonicGenerator for a provider/model, built once per session"""
+        key = (provider, model, with_fallback)
+        with self._lock:
+            if key not in self._generators:
+                self._generators[key] = MnemonicGenerator(
+                    provider=provider,
+                    api_key=self.config.get(f"{provider}_api_key", ""),
+                    model=model,
+                    retry_policy=self.retry_policy(provider),
+                    fallback=self.fallback_generator(provider) if with_fallback else None,
+                    cache=self.word_cache(),
+                    **self.generation_settings(),
+                    **self.provider_settings(provider),
+                )
+            return self._generators[key]
+
+    def fallback_generator(self, provider: str) -> Optional[MnemonicGenerator]:
+        """Generator for the other provider, used while the selected one is unhealthy"""
+        if not self.config.get("llm_failover", True) or provider == "local":
+            return None
+
+        other = "openai" if provider == "groq" else "groq"
+        model = self.config.get(f"{other}_model", "")
+        if not self.has_api_key(other) or not model:
+            return None
+
+        try:
+            return self.generator(other, model, with_fallback=False)
+        except Exception as e:
+            print(f"MnemoMaker: failover to {other} unavailable: {e}")
+            return None
+
+    def default_generator(self) -> Optional[MnemonicGenerator]:
+        """Generator for the provider and model chosen in the add-on config"""
+        provider = self.config.get("llm_provider", "groq").lower()
+        model = self.config.get(f"{provider}_model", "")
+        if not self.has_api_key(provider) or not model:
+            return None
+        try:
+            return self.generator(provider, model)
+        except Exception as e:
+            print(f"MnemoMaker: cannot create {provider} generator: {e}")
+            return None
+
+    # Deck index
+
+    def decks(self) -> List[Tuple[str, int]]:
+        """Sorted (name, id) pairs of every deck, rebuilt only after a deck change"""
+        with self._lock:
+            stale = self._decks_stale
+        if stale:
+            self._load_decks()
+        with self._lock:
+            return self._decks
+
+    def _load_decks(self):
+        decks = sorted(
+            ((deck.name, deck.id) for deck in mw.col.decks.all_names_and_ids()),
+            key=lambda deck: deck[0],
+        )
+        with self._lock:
+            self._decks = decks
+            self._decks_stale = False
+            self.decks_version += 1
+
+    def invalidate_decks(self, *args):
+        """Rebuild the deck index on next use; also a hook for
+        ``sync_did_finish`` and ``collection_did_load``, since decks that
+        arrive through a sync or a collection load report no deck change"""
+        with self._lock:
+            self._decks_stale = True
+
+    def on_operation_did_execute(self, changes, handler):
+        if changes.deck:
+            self.invalidate_decks()
+
+    # Lifecycle
+
+    def warm_up(self):
+        """Open the caches, build the default generator and index the decks
+        in the background, so the dialog has nothing left to do on open"""
+
+        def warm():
+            self.job_queue()
+            self.usage_log()
+            self.word_cache()
+            self.default_generator()
+            self._load_decks()
+
+        def on_done(future):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"MnemoMaker: warm-up failed: {e}")
+
+        mw.taskman.run_in_background(warm, on_done)
+
+    def on_profile_close(self):
+        """Drop the state that belongs to the closing profile's collection"""
+        with self._lock:
+            self._decks = []
+            self._decks_stale = True
+            self.decks_version += 1
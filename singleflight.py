@@ -0,0 +1,40 @@
+"""Coalescing of identical in-flight calls.
+
+When the same word is requested twice at once (a duplicate in a word list,
+two decks being built together), only the first caller does the work; the
+others wait for it and share its result or exception.
+"""
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """Call ``fn`` unless a call with the same key is already running,
+        in which case wait for that call's outcome instead"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -0,0 +1,11 @@
+"""Load the add-on folder as a package without running its Anki entry point"""
+import os
+import sys
+import types
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "mnemomaker" not in sys.modules:
+    package = types.ModuleType("mnemomaker")
+    package.__path__ = [ADDON_DIR]
+    sys.modules["mnemomaker"] = package
@@ -0,0 +1,52 @@
+from mnemomaker.cache import WordCache
+from mnemomaker.records import Entry, WordData
+
+
+def make_cache(tmp_path):
+    return WordCache(str(tmp_path / "cache.sqlite"))
+
+
+def page(word, forms=()):
+    return WordData(word, ["adjective"], [Entry(f"meaning of {word}")], headword=word, forms=forms)
+
+
+def test_regular_looking_forms_are_not_guessed(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_page("english-turkish/new", page("new"))
+    cache.put_page("english-turkish/good", page("good"))
+
+    # "news" and "goods" are words of their own and must be fetched literally
+    assert cache.resolve_dict_url("english-turkish/news") == "english-turkish/news"
+    assert cache.resolve_dict_url("english-turkish/goods") == "english-turkish/goods"
+
+
+def test_listed_inflections_that_are_headwords_are_not_redirected(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_page("english-turkish/leave", page("leave", forms=["left"]))
+    cache.put_page("english-turkish/see", page("see", forms=["saw", "seen"]))
+
+    # "left" and "saw" have pages of their own
+    assert cache.resolve_dict_url("english-turkish/left") == "english-turkish/left"
+    assert cache.resolve_dict_url("english-turkish/saw") == "english-turkish/saw"
+
+
+def test_confirmed_redirects_resolve(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_page("english-turkish/run", page("run", forms=["ran", "running"]))
+    assert cache.resolve_dict_url("english-turkish/ran") == "english-turkish/ran"
+
+    # Cambridge answered "ran" and "runs" with the page of "run"
+    cache.put_page("english-turkish/ran", page("run"))
+    cache.put_page("english-turkish/runs", page("run"))
+
+    assert cache.resolve_dict_url("english-turkish/ran") == "english-turkish/run"
+    assert cache.resolve_dict_url("english-turkish/runs") == "english-turkish/run"
+    assert cache.get_page("english-turkish/run").headword == "run"
+
+
+def test_run_ons_from_old_records_are_not_indexed(tmp_path):
+    cache = make_cache(tmp_path)
+    old_record = '[3,"happy",["adjective"],null,[],[],[],"happy",["happily"]]'
+    cache.put_page("english-turkish/happy", WordData.loads(old_record))
+
+    assert cache.lookup_lemma("english-turkish", "happily") is None
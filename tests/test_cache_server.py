@@ -0,0 +1,55 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from mnemomaker.cache_server import make_server
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    server = make_server(str(tmp_path / "shared.sqlite"), port=0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_put_then_get(server_url):
+    post(f"{server_url}/put", {"namespace": "pages", "items": {"english-turkish/run": "x"}})
+    status, result = post(
+        f"{server_url}/get", {"namespace": "pages", "keys": ["english-turkish/run", "other"]}
+    )
+    assert status == 200
+    assert result == {"values": {"english-turkish/run": "x"}, "leased": []}
+
+
+@pytest.mark.parametrize(
+    "path, payload",
+    [
+        ("/get", {"namespace": "pages", "keys": ["a"], "wait": "x"}),
+        ("/get", {"namespace": "pages", "keys": "abc"}),
+        ("/get", {"namespace": "pages", "keys": [1, 2]}),
+        ("/put", {"namespace": "pages", "items": ["a"]}),
+        ("/put", {"namespace": "pages", "items": {"a": 1}}),
+        ("/release", {"namespace": "pages", "keys": {"a": "b"}}),
+    ],
+)
+def test_malformed_requests_get_a_400(server_url, path, payload):
+    status, result = post(f"{server_url}{path}", payload)
+    assert status == 400
+    assert "error" in result
@@ -0,0 +1,73 @@
+import pytest
+
+from mnemomaker.cache import WordCache
+from mnemomaker.camanki import mnemonic_cache_key
+from mnemomaker.packs import WordPack, export_pack
+from mnemomaker.records import Entry, WordData
+
+LANGUAGES = ("Turkish", "English")
+
+
+def page(word):
+    return WordData(word, ["verb"], [Entry(f"meaning of {word}", "anlam")], headword=word)
+
+
+@pytest.fixture
+def pack_path(tmp_path):
+    cache = WordCache(str(tmp_path / "cache.sqlite"))
+    cache.put_page("english-turkish/run", page("run"))
+    # Cambridge answered "ran" with the page of "run"
+    cache.put_page("english-turkish/ran", page("run"))
+    cache.put_page("english-french/run", page("run"))
+    key = mnemonic_cache_key("run", "meaning of run", *LANGUAGES)
+    cache.put_mnemonic(key, {"mnemonic": "Run!", "synonym": "sprint", "antonym": "walk"})
+
+    path = str(tmp_path / "english-turkish.mnpk")
+    counts = export_pack(cache, path, "english-turkish", LANGUAGES)
+    assert counts == {"pages": 2, "mnemonics": 1, "lemmas": 2}
+    cache.close()
+    return path
+
+
+def test_round_trip(pack_path):
+    pack = WordPack(pack_path)
+    try:
+        assert pack.meta["dictionary"] == "english-turkish"
+        assert pack.get_page("english-turkish/run").entries[0].definition == "meaning of run"
+        assert pack.get_page("english-turkish/ran").headword == "run"
+        key = mnemonic_cache_key("run", "meaning of run", *LANGUAGES)
+        assert pack.get_mnemonic(key) == {"mnemonic": "Run!", "synonym": "sprint", "antonym": "walk"}
+        assert pack.lookup_lemma("english-turkish", "ran") == "run"
+        assert pack.lookup_lemma("english-turkish", "run") == "run"
+    finally:
+        pack.close()
+
+
+def test_misses(pack_path):
+    pack = WordPack(pack_path)
+    try:
+        assert pack.get_page("english-turkish/walk") is None
+        assert pack.get_page("english-french/run") is None
+        assert pack.get_mnemonic(mnemonic_cache_key("walk", "", *LANGUAGES)) is None
+        assert pack.lookup_lemma("english-turkish", "walked") is None
+    finally:
+        pack.close()
+
+
+def test_truncated_pack_is_rejected(pack_path, tmp_path):
+    with open(pack_path, "rb") as f:
+        data = f.read()
+    truncated = tmp_path / "truncated.mnpk"
+    truncated.write_bytes(data[:-10])
+
+    with pytest.raises(ValueError, match="truncated"):
+        WordPack(str(truncated))
+
+
+@pytest.mark.parametrize("content", [b"", b"MNPK", b"PK\x03\x04" + b"\0" * 60])
+def test_empty_or_foreign_file_is_rejected(tmp_path, content):
+    path = tmp_path / "other.mnpk"
+    path.write_bytes(content)
+
+    with pytest.raises(ValueError, match="not a word pack"):
+        WordPack(str(path))
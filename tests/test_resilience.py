@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from mnemomaker.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+def test_concurrent_rate_limits_do_not_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5)
+    policy = RetryPolicy(max_attempts=10, base_delay=0.01, deadline=10)
+    lock = threading.Lock()
+    responses = {"rate_limited": 0}
+
+    def call(timeout):
+        with lock:
+            if responses["rate_limited"] < 6:
+                responses["rate_limited"] += 1
+                raise http_error(429, {"Retry-After": "0.05"})
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: policy.call(call, breaker), range(4)))
+
+    assert results == ["ok"] * 4
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_server_errors_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    policy = RetryPolicy(max_attempts=2, base_delay=0.01, deadline=10)
+
+    def call(timeout):
+        raise http_error(503)
+
+    with pytest.raises(requests.HTTPError):
+        policy.call(call, breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        policy.call(call, breaker)
+
+
+def test_open_breaker_is_waited_out_within_the_deadline():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    policy = RetryPolicy(base_delay=0.05, deadline=5)
+
+    assert policy.call(lambda timeout: "ok", breaker, wait_for_breaker=True) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
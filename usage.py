@@ -0,0 +1,77 @@
+"""Token usage per created card, kept so the LLM cost of a card can be
+measured over time (e.g. before and after changing the prompt profile).
+
+Cards whose mnemonics came from a cache are recorded with zero tokens, so
+the average cost per card reflects caching too.
+"""
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS card_usage (
+    id INTEGER PRIMARY KEY,
+    note_id INTEGER,
+    word TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS card_usage_created ON card_usage (created_at);
+"""
+
+
+class UsageLog:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(
+        self,
+        note_id: Optional[int],
+        word: str,
+        provider: str,
+        model: str,
+        usage: Optional[Dict],
+    ):
+        usage = usage or {}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO card_usage (note_id, word, provider, model, prompt_tokens,"
+                " completion_tokens, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    note_id,
+                    word,
+                    provider,
+                    model,
+                    usage.get("prompt_tokens", 0),
+                    usage.get("completion_tokens", 0),
+                    time.time(),
+                ),
+            )
+
+    def totals(self, since: float = 0.0) -> Dict:
+        """Cards, token sums and average tokens per card created since ``since``"""
+        with self._lock:
+            cards, prompt_tokens, completion_tokens = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0),"
+                " COALESCE(SUM(completion_tokens), 0) FROM card_usage WHERE created_at >= ?",
+                (since,),
+            ).fetchone()
+        return {
+            "cards": cards,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_card": (prompt_tokens + completion_tokens) / cards if cards else 0.0,
+        }